@@ -1,6 +1,7 @@
 import json
-import random
 import math
+import time
+import numpy as np
 
 class Point:
     def __init__(self, x, y, weight):
@@ -17,26 +18,41 @@ class DroneDeliveryProblem:
         self.drone_weight = data['drone_weight']
         self.max_capacity = data['max_capacity']
         self.battery_capacity = data['battery_capacity']
-        self.viable_solution = False
-        self.mutation_rate = 0.8
+        # Distances and weights are looked up on every edge of every route,
+        # so they are computed once here instead of in calculate_fitness: a
+        # contiguous N x N float64 matrix and weight array for the batch
+        # evaluator, plus nested-list copies for evaluate, which reads one
+        # element at a time and is faster on lists than on NumPy scalars
+        xs = np.array([p.x for p in self.points], dtype=np.float64)
+        ys = np.array([p.y for p in self.points], dtype=np.float64)
+        dx = xs[:, None] - xs[None, :]
+        dy = ys[:, None] - ys[None, :]
+        self.distance_matrix = np.sqrt(dx * dx + dy * dy)
+        self.weights = [p.weight for p in self.points]
+        self.weight_array = np.array(self.weights, dtype=np.float64)
+        self.distances = self.distance_matrix.tolist()
 
     def distance(self, p1, p2):
         return math.sqrt((p1.x - p2.x)**2 + (p1.y - p2.y)**2)
 
     def calculate_fitness(self, path):
+        return self.evaluate(path)[0]
+
+    def evaluate(self, path):
+        """Fitness and validity of a path. Has no side effects, so one problem can serve many runs."""
         is_viable_solution = True
         path = [0] + path + [0]  # Start and end with base
+        distances = self.distances
+        weights = self.weights
         total_battery_usage = 0
         current_weight = self.drone_weight
         current_battery = self.battery_capacity
 
         for i in range(len(path) - 1, 0, -1):
-            current_point = self.points[path[i]]
-            next_point = self.points[path[i-1]]
-            
-            distance = self.distance(current_point, next_point)
-            battery_usage = distance * current_weight
-            current_weight += next_point.weight
+            next_index = path[i-1]
+
+            battery_usage = distances[path[i]][next_index] * current_weight
+            current_weight += weights[next_index]
             
             total_battery_usage += battery_usage
             current_battery -= battery_usage
@@ -45,44 +61,168 @@ class DroneDeliveryProblem:
                 total_battery_usage += 50000
                 is_viable_solution = False
             
-            if path[i-1] == 0:
+            if next_index == 0:
                 current_weight = self.drone_weight
                 current_battery = self.battery_capacity
 
-        if not self.viable_solution and is_viable_solution:
+        return total_battery_usage, is_viable_solution
+
+    def calculate_fitness_batch(self, routes):
+        """Evaluates many routes in one vectorized pass.
+
+        routes is either a list of paths or an integer matrix with one path
+        per row, padded on the right with -1. Returns the fitness values and
+        the validity flags as two arrays. The routes are walked backwards one
+        column at a time for all rows at once, so the arithmetic is the same
+        as in calculate_fitness and the results match it exactly.
+        """
+        if not isinstance(routes, np.ndarray):
+            routes = pad_routes(routes)
+        routes = np.asarray(routes)
+        batch_size, route_length = routes.shape
+
+        # [0] + path + [0] for every row; padding becomes extra base visits
+        # that cost nothing and are never penalized
+        full_paths = np.zeros((batch_size, route_length + 2), dtype=np.intp)
+        full_paths[:, 1:-1] = np.where(routes < 0, 0, routes)
+        is_padding = np.zeros((batch_size, route_length + 2), dtype=bool)
+        is_padding[:, 1:-1] = routes < 0
+
+        distances = self.distance_matrix
+        weights = self.weight_array
+        total_battery_usage = np.zeros(batch_size)
+        current_weight = np.full(batch_size, self.drone_weight, dtype=np.float64)
+        current_battery = np.full(batch_size, self.battery_capacity, dtype=np.float64)
+        is_valid = np.ones(batch_size, dtype=bool)
+
+        for i in range(route_length + 1, 0, -1):
+            next_index = full_paths[:, i-1]
+
+            battery_usage = distances[full_paths[:, i], next_index] * current_weight
+            current_weight = current_weight + weights[next_index]
+
+            total_battery_usage = total_battery_usage + battery_usage
+            current_battery = current_battery - battery_usage
+
+            violated = (current_battery < 0) | (current_weight > self.max_capacity)
+            violated &= ~is_padding[:, i-1]
+            total_battery_usage = total_battery_usage + np.where(violated, 50000.0, 0.0)
+            is_valid &= ~violated
+
+            at_base = next_index == 0
+            current_weight = np.where(at_base, self.drone_weight, current_weight)
+            current_battery = np.where(at_base, self.battery_capacity, current_battery)
+
+        return total_battery_usage, is_valid
+
+def pad_routes(paths):
+    """Stacks paths of different lengths into a -1 padded int32 matrix."""
+    routes = np.full((len(paths), max((len(path) for path in paths), default=0)), -1, dtype=np.int32)
+    for row, path in enumerate(paths):
+        routes[row, :len(path)] = path
+    return routes
+
+def smallest_indices(values, count):
+    """Indices of the count smallest values, in the order a stable sort would give them."""
+    count = min(count, len(values))
+    if count == 0:
+        return np.empty(0, dtype=np.intp)
+    threshold = np.partition(values, count - 1)[count - 1]
+    candidates = np.flatnonzero(values <= threshold)
+    return candidates[np.argsort(values[candidates], kind='stable')][:count]
+
+class MutationController:
+    """Adaptive mutation state of one GA run, kept off the shared problem."""
+    __slots__ = ('mutation_rate', 'viable_solution')
+
+    def __init__(self, mutation_rate=0.8):
+        self.mutation_rate = mutation_rate
+        self.viable_solution = False
+
+    def register_fitness(self, is_valid):
+        # The first valid route calms the mutation rate down
+        if not self.viable_solution and is_valid:
             self.viable_solution = True
             self.mutation_rate = 0.1
-        return total_battery_usage
+
+    def adapt(self, stagnation_counter):
+        """Once per generation; True when the rate was raised and the stagnation count should restart."""
+        if stagnation_counter > 50:  # Example threshold
+            self.mutation_rate = 0.9
+            return True
+        if self.mutation_rate > 0.1:
+            self.mutation_rate -= 0.01  # Gradually reduce mutation rate
+        return False
+
+class RandomStream:
+    """Draws from a NumPy Generator, taken in blocks to keep the per-call cost low.
+
+    The operators need one small random number at a time; asking the
+    Generator for each of them costs far more than the number itself.
+    """
+    __slots__ = ('generator', 'block_size', 'buffer')
+
+    def __init__(self, seed=None, block_size=4096):
+        self.generator = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+        self.block_size = block_size
+        self.buffer = []
+
+    def random(self):
+        if not self.buffer:
+            self.buffer = self.generator.random(self.block_size).tolist()
+        return self.buffer.pop()
+
+    def randrange(self, n):
+        return int(self.random() * n)
+
+    def sample_pair(self, n):
+        """Two different integers in [0, n), like random.sample(range(n), 2)."""
+        i = self.randrange(n)
+        j = self.randrange(n - 1)
+        return i, j + (j >= i)
+
+    def shuffle(self, items):
+        items[:] = [items[i] for i in self.generator.permutation(len(items))]
+
+    def spawn(self, count):
+        """count independent streams for other threads or processes."""
+        return [RandomStream(generator, self.block_size) for generator in self.generator.spawn(count)]
 
 class Individual:
-    def __init__(self, path, problem):
+    __slots__ = ('path', 'problem', 'fitness', 'is_valid')
+
+    def __init__(self, path, problem, rng, mutation_rate, evaluate=True):
         self.path = path
         self.problem = problem
         self.fitness = None
+        self.is_valid = None
         self.normalize()
-        if random.random() < self.problem.mutation_rate:
-            self.mutate()
-        self.calculate_fitness()
+        if rng.random() < mutation_rate:
+            self.mutate(rng)
+        if evaluate:
+            self.calculate_fitness()
         
 
     def calculate_fitness(self):
-        self.fitness = self.problem.calculate_fitness(self.path)
+        self.fitness, self.is_valid = self.problem.evaluate(self.path)
 
-    def mutate(self):
-        if random.random() < 0.5:
-            if random.random() < 0.5:
-                i = random.randint(1, len(self.path) - 1)
-                self.path.insert(i, 0)
+    def mutate(self, rng):
+        if rng.random() < 0.5:
+            if rng.random() < 0.5:
+                if len(self.path) > 1:
+                    i = 1 + rng.randrange(len(self.path) - 1)
+                    self.path.insert(i, 0)
             else:
                 #take out a random 0
                 zero_indexes = [i for i, x in enumerate(self.path) if x == 0]
                 if len(zero_indexes) > 1:
-                    self.path.pop(random.choice(zero_indexes))
+                    self.path.pop(zero_indexes[rng.randrange(len(zero_indexes))])
         else:
             #select two random cities and swap them
             city_indexes = [i for i, x in enumerate(self.path) if x != 0]
             if len(city_indexes) > 1:
-                i, j = random.sample(city_indexes, 2)
+                i, j = rng.sample_pair(len(city_indexes))
+                i, j = city_indexes[i], city_indexes[j]
                 if(self.path[i] > 0 and self.path[i] < 5):
                     pass #debug
                 self.path[i], self.path[j] = self.path[j], self.path[i]
@@ -90,36 +230,67 @@ class Individual:
         self.normalize()
 
     def normalize(self):
-        i = 0
-        while i < len(self.path):
-            if self.path[i] == 0 and (i == 0 or i == len(self.path) - 1 or self.path[i - 1] == 0):
-                self.path.pop(i)
-            else:
-                i += 1
+        # Drops leading, trailing and repeated 0s in a single pass
+        normalized = []
+        for gene in self.path:
+            if gene == 0 and (len(normalized) == 0 or normalized[-1] == 0):
+                continue
+            normalized.append(gene)
+        if len(normalized) > 0 and normalized[-1] == 0:
+            normalized.pop()
+        self.path[:] = normalized
 
 class GeneticAlgorithm:
-    def __init__(self, problem, population_size=2000, generations=2000):
+    def __init__(self, problem, population_size=2000, generations=2000, batch_fitness=False, verbose=True,
+                 seed=None, controller=None):
         self.problem = problem
+        self.controller = controller if controller is not None else MutationController()
+        # Every random decision of the run comes from this stream; seed is an
+        # int, a NumPy Generator or None for a random seed
+        self.rng = RandomStream(seed)
         self.population_size = population_size
         self.generations = generations
+        self.verbose = verbose
+        self.fitness_over_time = []
+        # When set, children are evaluated together once per generation
+        # with calculate_fitness_batch instead of one by one. Off by default:
+        # the batch call is about twice as fast as evaluate on the same routes,
+        # but building and mutating the children in Python dominates a
+        # generation, so a whole run is not faster with it
+        self.batch_fitness = batch_fitness
         self.best_5_per_generation = []
         self.stagnation_counter = 0
         self.best_fitness = float('inf')
 
     def adaptive_mutation_rate(self):
-        if self.stagnation_counter > 50:  # Example threshold
-            self.problem.mutation_rate = 0.9
+        if self.controller.adapt(self.stagnation_counter):
             self.stagnation_counter = 0  # Reset counter after adapting
-        elif self.problem.mutation_rate > 0.1:
-            self.problem.mutation_rate -= 0.01  # Gradually reduce mutation rate
 
     def create_individual(self):
         path = list(range(1, len(self.problem.points) - 1))
-        random.shuffle(path)
-        return Individual(path, self.problem)
+        self.rng.shuffle(path)
+        return self.new_individual(path)
+
+    def new_individual(self, path):
+        # In batch mode the fitness, and so the validity, comes later in evaluate_population
+        individual = Individual(path, self.problem, self.rng, self.controller.mutation_rate,
+                                evaluate=not self.batch_fitness)
+        if individual.is_valid is not None:
+            self.controller.register_fitness(individual.is_valid)
+        return individual
+
+    def evaluate_population(self, population):
+        pending = [individual for individual in population if individual.fitness is None]
+        if len(pending) == 0:
+            return
+        fitness, is_valid = self.problem.calculate_fitness_batch([individual.path for individual in pending])
+        for individual, value, valid in zip(pending, fitness.tolist(), is_valid.tolist()):
+            individual.fitness = value
+            individual.is_valid = valid
+        self.controller.register_fitness(bool(is_valid.any()))
 
     def order_crossover(self, parent1, parent2):
-        start, end = sorted(random.sample(range(len(parent1.path)), 2))
+        start, end = sorted(self.rng.sample_pair(len(parent1.path)))
         child_path = [-1] * len(parent1.path)
         child_path[start:end] = parent1.path[start:end]
         i = end
@@ -129,7 +300,7 @@ class GeneticAlgorithm:
                 i += 1
         while -1 in child_path:
             child_path[child_path.index(-1)] = 0
-        child = Individual(child_path, self.problem)
+        child = self.new_individual(child_path)
         return child
     
     def partially_matched_crossover(self, parent1, parent2):
@@ -158,47 +329,62 @@ class GeneticAlgorithm:
             parent2_subroutes.append(route)
 
         # Crossover
-        already_added_cities = []
+        already_added_cities = bytearray(len(self.problem.points))  # bitmap indexed by city id
         child_route = []
         while len(parent1_subroutes) > 0 and len(parent2_subroutes) > 0:
             #select random subroute from parent1
             if len(parent1_subroutes) > 0:
-                subroute_1 = parent1_subroutes.pop(random.randint(0,len(parent1_subroutes)-1))
+                subroute_1 = parent1_subroutes.pop(self.rng.randrange(len(parent1_subroutes)))
                 for i in subroute_1:
-                    if i not in already_added_cities:
-                        already_added_cities.append(i)
+                    if not already_added_cities[i]:
+                        already_added_cities[i] = 1
                         child_route.append(i)
                 child_route.append(0)
             #select random subroute from parent2
             if len(parent2_subroutes) > 0:
-                subroute_2 = parent2_subroutes.pop(random.randint(0,len(parent2_subroutes)-1))
+                subroute_2 = parent2_subroutes.pop(self.rng.randrange(len(parent2_subroutes)))
                 for i in subroute_2:
-                    if i not in already_added_cities:
-                        already_added_cities.append(i)
+                    if not already_added_cities[i]:
+                        already_added_cities[i] = 1
                         child_route.append(i)
                 child_route.append(0)
-        child = Individual(child_route, self.problem)
+        child = self.new_individual(child_route)
         return child
 
-    def tournament_selection(self, population, tournament_size=3):
-        tournament1 = random.sample(population, tournament_size)
-        min_individual1 = min(tournament1, key=lambda individual: individual.fitness)
-        tournament2 = random.sample(population, tournament_size)
-        min_individual2 = min(tournament2, key=lambda individual: individual.fitness)
-        return min_individual1, min_individual2
-    
+    def tournament_winners(self, fitness, tournaments, tournament_size=3):
+        """Runs all tournaments of a generation at once on the fitness array."""
+        rng = self.rng.generator
+        tournament_size = min(tournament_size, len(fitness))
+        entrants = rng.integers(0, len(fitness), size=(tournaments, tournament_size))
+        # Redraw tournaments that picked someone twice, like random.sample never does
+        repeated = (np.sort(entrants, axis=1)[:, 1:] == np.sort(entrants, axis=1)[:, :-1]).any(axis=1)
+        while repeated.any():
+            entrants[repeated] = rng.integers(0, len(fitness), size=(int(repeated.sum()), tournament_size))
+            ordered = np.sort(entrants, axis=1)
+            repeated = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+        return entrants[np.arange(tournaments), np.argmin(fitness[entrants], axis=1)]
+
     def random_sample_selection(self, population, cut=50):
-        return random.sample(population[:cut], 2)
+        i, j = self.rng.sample_pair(min(cut, len(population)))
+        return population[i], population[j]
     
 
     def run(self):
+        start_time = time.time()
         population = [self.create_individual() for _ in range(self.population_size)]
+        self.evaluate_population(population)
+
+        elitism_number = int(self.population_size * 0.05)
+        elitism_number += elitism_number % 2 #evening the elitism number
 
         for generation in range(self.generations):
-            population.sort(key=lambda individual: individual.fitness)
-            self.best_5_per_generation.append([ind.path for ind in population[:5]])
+            # Only the elite (and the best 5) need ordering
+            fitness = np.array([individual.fitness for individual in population], dtype=np.float64)
+            ranked = [population[i] for i in smallest_indices(fitness, max(elitism_number, 5))]
+            self.best_5_per_generation.append([ind.path for ind in ranked[:5]])
             
-            current_best_fitness = population[0].fitness
+            current_best_fitness = ranked[0].fitness
+            self.fitness_over_time.append((current_best_fitness, time.time() - start_time))
             if current_best_fitness < self.best_fitness:
                 self.best_fitness = current_best_fitness
                 self.stagnation_counter = 0
@@ -207,30 +393,30 @@ class GeneticAlgorithm:
 
             self.adaptive_mutation_rate()
 
-            if generation % 2 == 0:
+            if self.verbose and generation % 2 == 0:
                 print(f"Generation {generation}: Best fitness = {self.best_fitness}")
-                print(f'Best solution: {population[0].path}')
-            elitism_number = int(self.population_size * 0.05)
-            elitism_number += elitism_number % 2 #evening the elitism number
-            new_population = population[:elitism_number]
-
-            while len(new_population) < self.population_size:
-                parent1, parent2 = self.tournament_selection(population)
-                child = self.partially_matched_crossover(parent1, parent2)
+                print(f'Best solution: {ranked[0].path}')
+            new_population = ranked[:elitism_number]
+
+            winners = self.tournament_winners(fitness, 2 * (self.population_size - len(new_population))).tolist()
+            for k in range(0, len(winners), 2):
+                child = self.partially_matched_crossover(population[winners[k]], population[winners[k + 1]])
                 new_population.append(child)
 
+            self.evaluate_population(new_population)
             population = new_population
 
         best_solution = min(population, key=lambda individual: individual.fitness)
         return best_solution.path, best_solution.fitness
 
 # Usage
-problem = DroneDeliveryProblem('drone_problem_2.json')
-ga = GeneticAlgorithm(problem)
-best_path, best_fitness = ga.run()
+if __name__ == '__main__':
+    problem = DroneDeliveryProblem('drone_problem_2.json')
+    ga = GeneticAlgorithm(problem)
+    best_path, best_fitness = ga.run()
 
-with open('best_5_per_generation.json', 'w') as f:
-    json.dump(ga.best_5_per_generation, f)
+    with open('best_5_per_generation.json', 'w') as f:
+        json.dump(ga.best_5_per_generation, f)
 
-print(f"Best path: {best_path}")
-print(f"Best fitness: {best_fitness}")
\ No newline at end of file
+    print(f"Best path: {best_path}")
+    print(f"Best fitness: {best_fitness}")
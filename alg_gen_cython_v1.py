@@ -1,6 +1,8 @@
 import json
 import os 
-from drone_delivery_cython import DroneDeliveryProblem, GeneticAlgorithm
+from drone_delivery_cython import DroneDeliveryProblem, GeneticAlgorithm, load_seed_routes
+from telemetry import TelemetrySink, FILE_NAME as TELEMETRY_FILE
+from render import render_results
 
 run_all = True
 
@@ -15,27 +17,34 @@ for file_name in files:
     with open(file_path, 'r') as f:
         problemData = json.load(f)
         
-    problem = DroneDeliveryProblem(problemData)
-    ga = GeneticAlgorithm(problem, population_size=1000, generations=1000)
-    best_path, best_fitness = ga.run()
-    
     file_number = file_name.split('_')[-1].split('.')[0]
     os.makedirs(f'results/{file_number}', exist_ok=True)
-    
-    with open(f'results/{file_number}/generation_data.json', 'w') as f:
-        json.dump(ga.generation_data, f)
+
+    problem = DroneDeliveryProblem(problemData)
+    # A run that was killed is picked up from its last checkpoint
+    checkpoint_path = f'results/{file_number}/checkpoint.bin'
+    resuming = os.path.exists(checkpoint_path)
+    # Warm start from heuristics and from the best route of the last run on this instance
+    seed_routes = load_seed_routes(f'results/{file_number}/best_path_graph.json')
+    with TelemetrySink(f'results/{file_number}/{TELEMETRY_FILE}', append=resuming) as telemetry:
+        ga = GeneticAlgorithm(problem, population_size=1000, generations=1000, telemetry=telemetry,
+                              max_stagnation=200, checkpoint_path=checkpoint_path, checkpoint_interval=50,
+                              seeding={'nearest_neighbour': 0.05, 'savings': 0.05, 'stored': 0.05},
+                              seed_routes=seed_routes)
+        best_path, best_fitness = ga.resume(checkpoint_path) if resuming else ga.run()
+    for path in (checkpoint_path, f'{checkpoint_path}.history'):
+        if os.path.exists(path):
+            os.remove(path)
 
     with open(f'results/{file_number}/best_path_graph.json', 'w') as f:
         points = [{"x": p['x'], "y": p['y'], "peso": p['peso']} for p in problemData['pontos']]
-        json.dump({"best_path": best_path, "best_fitness": best_fitness, "coordinates": points}, f)
-    
-    with open(f'results/{file_number}/fitness_over_time.json', 'w') as f:
-        json.dump(ga.fitness_over_time, f)
+        json.dump({"best_path": best_path, "best_fitness": best_fitness, "coordinates": points,
+                   "stop_reason": ga.stop_reason, "stop_generation": ga.stop_generation}, f)
 
     print(f"{file_name} - Best path: {best_path}")
     print(f"{file_name} - Best fitness: {best_fitness}")
+    print(f"{file_name} - Stopped by {ga.stop_reason} at generation {ga.stop_generation}")
     print()
     
-os.system('python visualizar_geracoes.py')
-os.system('python visualizar_melhor_caminho.py')
-os.system('python visualizar_fitness_over_time.py')
\ No newline at end of file
+# Redraw the plots of the instances whose results changed
+render_results()
@@ -1,31 +1,6 @@
-import json
 import os
-from drone_delivery_cython import DroneDeliveryProblem, GeneticAlgorithm
-from concurrent.futures import ProcessPoolExecutor
-
-def process_file(file_name):
-    file_path = f'tests/{file_name}'    
-    with open(file_path, 'r') as f:
-        problemData = json.load(f)
-        
-    problem = DroneDeliveryProblem(problemData)
-    ga = GeneticAlgorithm(problem, population_size=1000, generations=1000)
-    best_path, best_fitness = ga.run()
-    
-    file_number = file_name.split('_')[-1].split('.')[0]
-    os.makedirs(f'results/{file_number}', exist_ok=True)
-    
-    with open(f'results/{file_number}/generation_data.json', 'w') as f:
-        json.dump(ga.generation_data, f)
-
-    with open(f'results/{file_number}/best_path_graph.json', 'w') as f:
-        points = [{"x": p['x'], "y": p['y'], "peso": p['peso']} for p in problemData['pontos']]
-        json.dump({"best_path": best_path, "best_fitness": best_fitness, "coordinates": points}, f)
-    
-    with open(f'results/{file_number}/fitness_over_time.json', 'w') as f:
-        json.dump(ga.fitness_over_time, f)
-
-    return f"{file_name} - Best path: {best_path}\n{file_name} - Best fitness: {best_fitness}\n"
+from batch_solver import read_instances, solve_batch
+from render import render_results
 
 if __name__ == "__main__":
     run_all = True
@@ -36,15 +11,18 @@ if __name__ == "__main__":
         # Choose a specific file
         files = ['drone_problem_3.json']
 
-    # Use multiprocessing to process files in parallel
-    with ProcessPoolExecutor() as executor:
-        results = list(executor.map(process_file, files))
-
-    # Print all results
-    for result in results:
-        print(result)
-
-    # Run the visualization scripts after all processes are done
-    os.system('python visualizar_geracoes.py')
-    os.system('python visualizar_melhor_caminho.py')
-    os.system('python visualizar_fitness_over_time.py')
\ No newline at end of file
+    # Results go to results/<number>/ like alg_gen_cython_v1.py
+    instances = ((name.split('_')[-1], data) for name, data in read_instances('tests')
+                 if f'{name}.json' in files)
+
+    # Solve the files in parallel on a persistent worker pool and print each one as it finishes
+    for result in solve_batch(instances, results_dir='results'):
+        name = f"drone_problem_{result['name']}.json"
+        if 'error' in result:
+            print(f"{name} - Failed: {result['error']}\n")
+            continue
+        print(f"{name} - Best path: {result['best_path']}\n{name} - Best fitness: {result['best_fitness']}\n"
+              f"{name} - Stopped by {result['stop_reason']} at generation {result['stop_generation']}\n")
+
+    # Redraw the plots of the instances whose results changed, in parallel
+    render_results(workers=os.cpu_count() or 1)
@@ -0,0 +1,256 @@
+import asyncio
+import itertools
+import os
+import queue
+import threading
+import time
+import multiprocessing as mp
+from multiprocessing.connection import wait
+from drone_delivery_cython import DroneDeliveryProblem, GeneticAlgorithm
+
+# asyncio front end for the solver. Jobs (problem dicts in the schema of
+# tests/drone_problem_*.json) go to a pool of worker processes that stay up
+# for the lifetime of the solver, so a request never pays for starting an
+# interpreter or loading the extension. Every job gets a SolveJob: await it
+# for the result, iterate job.updates() for best-so-far routes while it
+# runs, or cancel it.
+#
+#   async with AsyncSolver(workers=4) as solver:
+#       job = await solver.submit(problem_data, generations=300)
+#       async for update in job.updates():
+#           print(update['generation'], update['best_fitness'])
+#       result = await job
+#
+# Every worker talks back over its own pipe, which a reader thread drains
+# into the event loop; send returns once the message is written, so nothing
+# is lost when a worker dies. The reader also wakes up when a worker process
+# exits: a job whose worker died fails with RuntimeError and the worker is
+# replaced. Cancellations are broadcast to every worker's control queue and
+# checked between generations.
+
+DEFAULT_SETTINGS = {
+    'population_size': 1000,
+    'generations': 1000,
+    'max_stagnation': 200,
+    'time_limit': 0,
+    'target_fitness': float('-inf'),
+    'seed': None,
+}
+
+def drain_cancellations(control, cancelled):
+    while True:
+        try:
+            cancelled.add(control.get_nowait())
+        except queue.Empty:
+            return
+
+def solver_worker(tasks, control, connection, update_interval):
+    cancelled = set()
+    while True:
+        task = tasks.get()
+        if task is None:
+            connection.send(('stopped', None, None))
+            return
+        job_id, problem_data, settings = task
+        drain_cancellations(control, cancelled)
+        # Jobs are taken in submission order, so older cancellations can't matter any more
+        cancelled = {other for other in cancelled if other >= job_id}
+        if job_id in cancelled:
+            connection.send(('cancelled', job_id, None))
+            continue
+        connection.send(('start', job_id, None))
+        try:
+            start = time.perf_counter()
+            ga = GeneticAlgorithm(DroneDeliveryProblem(problem_data), **settings)
+            ga.initialize()
+            reported = float('inf')
+            last_update = 0.0
+            while True:
+                ga.stop_reason = ga.check_stop()
+                if ga.stop_reason is not None:
+                    break
+                ga.step()
+                drain_cancellations(control, cancelled)
+                if job_id in cancelled:
+                    break
+                elapsed = time.perf_counter() - start
+                if ga.best_fitness < reported and elapsed - last_update >= update_interval:
+                    reported = ga.best_fitness
+                    last_update = elapsed
+                    best_path, best_fitness = ga.best()
+                    connection.send(('update', job_id, {'generation': ga.generation, 'best_fitness': best_fitness,
+                                                    'best_path': best_path, 'time': elapsed}))
+            if job_id in cancelled:
+                connection.send(('cancelled', job_id, None))
+                continue
+            ga.stop_generation = ga.generation
+            best_path, best_fitness = ga.best()
+            connection.send(('done', job_id, {'best_path': best_path, 'best_fitness': best_fitness,
+                                          'stop_reason': ga.stop_reason, 'stop_generation': ga.stop_generation,
+                                          'time': time.perf_counter() - start}))
+        except Exception as error:
+            connection.send(('error', job_id, f'{type(error).__name__}: {error}'))
+
+class SolveJob:
+    """Handle of a submitted problem; awaiting it gives the result dict."""
+
+    def __init__(self, job_id, solver):
+        self.id = job_id
+        self.solver = solver
+        self.future = asyncio.get_running_loop().create_future()
+        self.future.add_done_callback(self._on_done)
+        self.best = None  # latest best-so-far update
+        self._updates = asyncio.Queue()
+
+    def __await__(self):
+        return self.future.__await__()
+
+    async def updates(self):
+        """Best-so-far updates ({generation, best_fitness, best_path, time}) until the job ends."""
+        while True:
+            update = await self._updates.get()
+            if update is None:
+                return
+            yield update
+
+    def cancel(self):
+        return self.future.cancel()
+
+    def done(self):
+        return self.future.done()
+
+    def _on_done(self, future):
+        self._updates.put_nowait(None)
+        if future.cancelled():
+            # Also covers cancellation from outside, e.g. asyncio.wait_for timing out
+            self.solver._cancel(self.id)
+
+class AsyncSolver:
+    def __init__(self, workers=None, queue_size=None, update_interval=0.1, **settings):
+        """Solver with `workers` processes and at most queue_size jobs waiting for one.
+
+        settings are GeneticAlgorithm arguments applied to every job
+        (population_size, generations, max_stagnation, time_limit,
+        target_fitness, gap_tolerance, seed); submit can override them per job.
+        update_interval is the minimum time in seconds between two
+        best-so-far updates of a job.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size if queue_size is not None else 2 * self.workers
+        self.update_interval = update_interval
+        self.settings = dict(DEFAULT_SETTINGS, **settings)
+        self.jobs = {}
+        self._ids = itertools.count()
+        self._pool = []  # (process, connection) of every worker
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        # Running jobs plus queued ones; submit waits while the queue is full
+        self._slots = asyncio.Semaphore(self.workers + self.queue_size)
+        self._tasks = mp.Queue()
+        self._controls = [mp.Queue() for _ in range(self.workers)]
+        self._pool = [self._start_worker(worker) for worker in range(self.workers)]
+        self._reader = threading.Thread(target=self._read_results, daemon=True)
+        self._reader.start()
+        return self
+
+    async def submit(self, problem_data, **settings):
+        """Queues a problem dict and returns its SolveJob; waits while the queue is full."""
+        await self._slots.acquire()
+        job = SolveJob(next(self._ids), self)
+        self.jobs[job.id] = job
+        self._tasks.put((job.id, problem_data, dict(self.settings, **settings)))
+        return job
+
+    async def solve(self, problem_data, **settings):
+        """Submits a problem and waits for its result."""
+        return await (await self.submit(problem_data, **settings))
+
+    def _cancel(self, job_id):
+        for control in self._controls:
+            control.put(job_id)
+
+    def _start_worker(self, worker):
+        receiver, sender = mp.Pipe(duplex=False)
+        process = mp.Process(target=solver_worker, daemon=True,
+                             args=(self._tasks, self._controls[worker], sender, self.update_interval))
+        process.start()
+        sender.close()
+        return process, receiver
+
+    def _read_results(self):
+        # Runs until every worker has stopped, see close
+        running = set(range(self.workers))
+        jobs = [None] * self.workers  # id of the job each worker is on
+        while running:
+            # Wakes up on a message or on a worker process exiting
+            ready = set(wait([self._pool[worker][1] for worker in running] +
+                             [self._pool[worker][0].sentinel for worker in running]))
+            for worker in list(running):
+                process, connection = self._pool[worker]
+                dead = process.sentinel in ready
+                # A dead worker's messages are all still in the pipe
+                while connection in ready or (dead and connection.poll()):
+                    ready.discard(connection)
+                    try:
+                        kind, job_id, payload = connection.recv()
+                    except EOFError:
+                        break
+                    if kind == 'start':
+                        jobs[worker] = job_id
+                    elif kind == 'stopped':
+                        running.discard(worker)
+                        dead = False
+                    else:
+                        if kind != 'update':
+                            jobs[worker] = None
+                        self._loop.call_soon_threadsafe(self._dispatch, kind, job_id, payload)
+                if dead and worker in running:
+                    process.join()
+                    connection.close()
+                    if jobs[worker] is not None:
+                        self._loop.call_soon_threadsafe(self._dispatch, 'error', jobs[worker],
+                                                        f'worker exited with code {process.exitcode}')
+                        jobs[worker] = None
+                    self._pool[worker] = self._start_worker(worker)
+
+    def _dispatch(self, kind, job_id, payload):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        if kind == 'update':
+            job.best = payload
+            if not job.done():
+                job._updates.put_nowait(payload)
+            return
+        # The job left its worker: free its slot whatever the outcome
+        del self.jobs[job_id]
+        self._slots.release()
+        if job.done():
+            return
+        if kind == 'done':
+            job.future.set_result(payload)
+        elif kind == 'error':
+            job.future.set_exception(RuntimeError(payload))
+        else:
+            job.future.cancel()
+
+    async def close(self, cancel_pending=False):
+        """Stops the workers once the submitted jobs are done (or cancelled)."""
+        if cancel_pending:
+            for job in list(self.jobs.values()):
+                job.cancel()
+        for _ in self._pool:
+            self._tasks.put(None)
+        # The reader returns once every worker, replacements included, has stopped
+        await self._loop.run_in_executor(None, self._reader.join)
+        for process, connection in self._pool:
+            await self._loop.run_in_executor(None, process.join)
+            connection.close()
+        self._pool = []
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close(cancel_pending=exc_info[0] is not None)
@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import multiprocessing as mp
+from multiprocessing.connection import wait
+from drone_delivery_cython import DroneDeliveryProblem, GeneticAlgorithm, RandomStream
+from telemetry import TelemetrySink, FILE_NAME as TELEMETRY_FILE
+
+# Solves many instances on a fixed pool of worker processes that live for
+# the whole batch, so the extension is loaded once per worker. Instances go
+# through one shared task queue: a worker takes the next instance as soon as
+# it is done with its last one, so a small instance never waits behind a big
+# one that happened to be assigned to the same worker. Results are yielded
+# (and written as JSON lines) in the order the runs finish.
+#
+#   python batch_solver.py tests/ --output results.jsonl
+#   cat instances.jsonl | python batch_solver.py - --workers 8
+
+DEFAULT_SETTINGS = {
+    'population_size': 1000,
+    'generations': 1000,
+    'max_stagnation': 200,
+    'time_limit': 0,
+    'gap_tolerance': 0,  # stop within this fraction of the lower bound, see GeneticAlgorithm
+    'seed': 0,
+    'seeding': None,  # warm-start mix, see GeneticAlgorithm
+    'results_dir': None,
+}
+
+def read_instances(source):
+    """Yields (name, data) from a directory of .json files, a JSONL file or '-' for JSONL on stdin.
+
+    In JSONL input each line is one instance; its 'name' field, if any,
+    names the run, otherwise the line number does.
+    """
+    if os.path.isdir(source):
+        for file_name in sorted(os.listdir(source)):
+            if file_name.endswith('.json'):
+                with open(os.path.join(source, file_name), 'r') as f:
+                    yield os.path.splitext(file_name)[0], json.load(f)
+        return
+    stream = sys.stdin if source == '-' else open(source, 'r')
+    try:
+        for line_number, line in enumerate(stream, 1):
+            if line.strip():
+                data = json.loads(line)
+                yield str(data.get('name', line_number)), data
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def solve_instance(index, name, data, settings):
+    problem = DroneDeliveryProblem(data)
+    # Seeded by position in the batch, so the result does not depend on which worker ran it
+    kwargs = dict(population_size=settings['population_size'], generations=settings['generations'],
+                  max_stagnation=settings['max_stagnation'], time_limit=settings['time_limit'],
+                  gap_tolerance=settings['gap_tolerance'], seed=RandomStream(settings['seed'], index),
+                  seeding=settings['seeding'])
+    start = time.perf_counter()
+    if settings['results_dir'] is not None:
+        os.makedirs(os.path.join(settings['results_dir'], name), exist_ok=True)
+        with TelemetrySink(os.path.join(settings['results_dir'], name, TELEMETRY_FILE)) as telemetry:
+            ga = GeneticAlgorithm(problem, telemetry=telemetry, **kwargs)
+            best_path, best_fitness = ga.run()
+    else:
+        ga = GeneticAlgorithm(problem, **kwargs)
+        best_path, best_fitness = ga.run()
+    result = {
+        'name': name,
+        'best_path': best_path,
+        'best_fitness': best_fitness,
+        'stop_reason': ga.stop_reason,
+        'stop_generation': ga.stop_generation,
+        'time': time.perf_counter() - start,
+    }
+    if settings['results_dir'] is not None:
+        with open(os.path.join(settings['results_dir'], name, 'best_path_graph.json'), 'w') as f:
+            points = [{"x": p['x'], "y": p['y'], "peso": p['peso']} for p in data['pontos']]
+            json.dump({"best_path": best_path, "best_fitness": best_fitness, "coordinates": points,
+                       "stop_reason": ga.stop_reason, "stop_generation": ga.stop_generation}, f)
+    return result
+
+def batch_worker(tasks, connection, settings):
+    # A pipe per worker rather than a shared queue: send returns once the
+    # message is written, so nothing sent is lost if the process dies later
+    while True:
+        task = tasks.get()
+        if task is None:
+            connection.send(('stop', None))
+            return
+        index, name, data = task
+        connection.send(('start', name))
+        try:
+            result = solve_instance(index, name, data, settings)
+        except Exception as error:
+            # One bad instance must not take the worker, and the batch, down
+            result = {'name': name, 'error': f'{type(error).__name__}: {error}'}
+        connection.send(('result', result))
+
+def feed_tasks(instances, tasks, workers, errors):
+    try:
+        for index, (name, data) in enumerate(instances):
+            tasks.put((index, name, data))
+    except Exception as error:
+        errors.append(error)
+    finally:
+        for _ in range(workers):
+            tasks.put(None)
+
+def start_worker(tasks, settings):
+    """(process, connection) of a new worker; the connection receives its messages."""
+    receiver, sender = mp.Pipe(duplex=False)
+    process = mp.Process(target=batch_worker, args=(tasks, sender, settings), daemon=True)
+    process.start()
+    sender.close()
+    return process, receiver
+
+def solve_batch(instances, workers=None, **settings):
+    """Solves every (name, data) of instances and yields one result dict per instance as it finishes.
+
+    Runs that fail yield {'name': ..., 'error': ...} instead, also when the
+    worker process dies on an instance (it is then replaced). settings
+    override DEFAULT_SETTINGS; with results_dir set, every run also writes
+    best_path_graph.json and telemetry.bin to results_dir/<name>/.
+    """
+    settings = dict(DEFAULT_SETTINGS, **settings)
+    workers = workers or os.cpu_count() or 1
+    # Bounded, so a long JSONL stream is read only as fast as it is solved
+    tasks = mp.Queue(maxsize=2 * workers)
+    pool = [start_worker(tasks, settings) for _ in range(workers)]
+    errors = []
+    feeder = threading.Thread(target=feed_tasks, args=(instances, tasks, workers, errors), daemon=True)
+    feeder.start()
+
+    in_flight = [None] * workers  # name of the instance each worker is on
+    running = set(range(workers))
+    try:
+        while running:
+            # Wakes up on a message or on a worker process exiting
+            ready = set(wait([pool[worker][1] for worker in running] +
+                             [pool[worker][0].sentinel for worker in running]))
+            for worker in list(running):
+                process, connection = pool[worker]
+                dead = process.sentinel in ready
+                # A dead worker's messages are all still in the pipe
+                while connection in ready or (dead and connection.poll()):
+                    ready.discard(connection)
+                    try:
+                        kind, payload = connection.recv()
+                    except EOFError:
+                        break
+                    if kind == 'start':
+                        in_flight[worker] = payload
+                    elif kind == 'result':
+                        in_flight[worker] = None
+                        yield payload
+                    else:
+                        running.discard(worker)
+                        dead = False
+                if dead and worker in running:
+                    process.join()
+                    connection.close()
+                    if in_flight[worker] is not None:
+                        yield {'name': in_flight[worker], 'error': f'worker exited with code {process.exitcode}'}
+                        in_flight[worker] = None
+                    pool[worker] = start_worker(tasks, settings)
+    finally:
+        if running:
+            # Stopped early by the caller; the feeder may be blocked on the full queue
+            tasks.cancel_join_thread()
+            for process, _ in pool:
+                process.terminate()
+        for process, connection in pool:
+            process.join()
+            connection.close()
+    feeder.join()
+    if errors:
+        raise errors[0]
+
+def main():
+    parser = argparse.ArgumentParser(description='Solve a batch of drone delivery instances.')
+    parser.add_argument('source', help="directory of .json instances, a JSONL file, or '-' for JSONL on stdin")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--population', type=int, default=DEFAULT_SETTINGS['population_size'])
+    parser.add_argument('--generations', type=int, default=DEFAULT_SETTINGS['generations'])
+    parser.add_argument('--max-stagnation', type=int, default=DEFAULT_SETTINGS['max_stagnation'])
+    parser.add_argument('--time-limit', type=float, default=DEFAULT_SETTINGS['time_limit'])
+    parser.add_argument('--gap-tolerance', type=float, default=DEFAULT_SETTINGS['gap_tolerance'],
+                        help='stop once the best is within this fraction of the lower bound')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SETTINGS['seed'])
+    parser.add_argument('--results-dir', help='also write best_path_graph.json and telemetry.bin per instance here')
+    parser.add_argument('--output', help='JSONL file for the results (default: stdout)')
+    args = parser.parse_args()
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for result in solve_batch(read_instances(args.source), workers=args.workers,
+                                  population_size=args.population, generations=args.generations,
+                                  max_stagnation=args.max_stagnation, time_limit=args.time_limit,
+                                  gap_tolerance=args.gap_tolerance, seed=args.seed, results_dir=args.results_dir):
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == "__main__":
+    main()
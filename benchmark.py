@@ -0,0 +1,212 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import multiprocessing as mp
+
+# Runs every GA engine on the tests/ instances (and optionally on synthetic
+# enlarged instances) with fixed seeds, and writes a JSON report that can be
+# diffed against the report of another commit with --compare.
+#
+#   python benchmark.py --generations 100 --scale 100 250 500
+#   python benchmark.py --compare benchmark_report_old.json
+#
+# alg_gen_cython_v1/v2 are drivers around the 'cython' engine; v2 only adds
+# parallelism across instances, so they are not benchmarked separately.
+
+ENGINES = ('python', 'python-batch', 'cython')
+
+def elitism_count(population_size):
+    elitism_number = int(population_size * 0.05)
+    return elitism_number + elitism_number % 2
+
+def evaluation_count(population_size, generations):
+    # The initial population plus every non-elite child, cache hits included
+    return population_size + generations * (population_size - elitism_count(population_size))
+
+def reference_fitness(instance_path):
+    """Best known fitness for an instance from its results/ folder, or None."""
+    number = os.path.basename(instance_path).split('_')[-1].split('.')[0]
+    candidates = []
+    best_path_file = f'results/{number}/best_path_graph.json'
+    if os.path.exists(best_path_file):
+        with open(best_path_file, 'r') as f:
+            candidates.append(json.load(f)['best_fitness'])
+    simplex_file = f'results/{number}/simplex.json'
+    if os.path.exists(simplex_file):
+        with open(simplex_file, 'r') as f:
+            candidates.extend(fitness for fitness, _ in json.load(f))
+    return min(candidates) if candidates else None
+
+def enlarge_instance(data, size, seed):
+    """Synthetic instance with `size` cities drawn around the ones of data."""
+    rng = random.Random(seed)
+    cities = data['pontos'][1:-1]
+    xs = [p['x'] for p in cities]
+    ys = [p['y'] for p in cities]
+    weights = [p['peso'] for p in cities]
+    new_cities = [{'x': rng.randint(min(xs), max(xs)), 'y': rng.randint(min(ys), max(ys)), 'peso': rng.choice(weights)}
+                  for _ in range(size)]
+    base = data['pontos'][0]
+    return dict(data, pontos=[base] + new_cities + [base])
+
+def run_python(data, instance_path, population_size, generations, seed, batch_fitness):
+    import alg_gen
+    problem = alg_gen.DroneDeliveryProblem(instance_path)
+    ga = alg_gen.GeneticAlgorithm(problem, population_size=population_size, generations=generations,
+                                  batch_fitness=batch_fitness, verbose=False, seed=seed)
+    start = time.perf_counter()
+    _, best_fitness = ga.run()
+    total = time.perf_counter() - start
+    # fitness_over_time has (best of generation, elapsed at its start)
+    trace = []
+    best_so_far = float('inf')
+    for fitness, elapsed in ga.fitness_over_time:
+        best_so_far = min(best_so_far, fitness)
+        trace.append((best_so_far, elapsed))
+    return best_fitness, total, trace, generations
+
+def run_cython(data, instance_path, population_size, generations, seed):
+    from drone_delivery_cython import DroneDeliveryProblem, GeneticAlgorithm
+    # The exact solver would answer the small instances without evolving
+    # anything, so it is left out of the engine comparison
+    ga = GeneticAlgorithm(DroneDeliveryProblem(data), population_size=population_size, generations=generations,
+                          seed=seed, exact_max_cities=0)
+    start = time.perf_counter()
+    ga.initialize()
+    trace = []
+    # The same stopping rules as ga.run(), so a proven optimum ends the run
+    while ga.check_stop() is None:
+        ga.step()
+        trace.append((ga.best_fitness, time.perf_counter() - start))
+    _, best_fitness = ga.best()
+    return best_fitness, time.perf_counter() - start, trace, ga.generation
+
+def benchmark_worker(engine, instance_path, data, population_size, generations, seed, target, results):
+    if engine == 'cython':
+        best_fitness, total, trace, generations = run_cython(data, instance_path, population_size, generations, seed)
+    else:
+        best_fitness, total, trace, generations = run_python(data, instance_path, population_size, generations, seed,
+                                                             batch_fitness=engine == 'python-batch')
+    time_to_target = None
+    if target is not None:
+        time_to_target = next((elapsed for fitness, elapsed in trace if fitness <= target), None)
+    evaluations = evaluation_count(population_size, generations)
+    results.put({
+        'best_fitness': best_fitness,
+        'total_time': total,
+        'generations_run': generations,
+        'time_per_generation': total / generations if generations else None,
+        'evaluations': evaluations,
+        'evaluations_per_second': evaluations / total if total > 0 else None,
+        'time_to_target': time_to_target,
+        # ru_maxrss is in KiB on Linux; each run has its own spawned process
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    })
+
+def run_benchmark(engine, instance_name, instance_path, data, population_size, generations, seed, target):
+    context = mp.get_context('spawn')
+    results = context.Queue()
+    worker = context.Process(target=benchmark_worker,
+                             args=(engine, instance_path, data, population_size, generations, seed, target, results))
+    worker.start()
+    result = results.get()
+    worker.join()
+    return dict({
+        'engine': engine,
+        'instance': instance_name,
+        'points': len(data['pontos']),
+        'seed': seed,
+        'population_size': population_size,
+        'generations': generations,
+        'target_fitness': target,
+    }, **result)
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_reports(old_report, new_report):
+    key = lambda run: (run['engine'], run['instance'], run['seed'])
+    old_runs = {key(run): run for run in old_report['runs']}
+    for run in new_report['runs']:
+        old = old_runs.get(key(run))
+        if old is None:
+            continue
+        speedup = old['total_time'] / run['total_time'] if run['total_time'] > 0 else float('inf')
+        print(f"{run['engine']:>13} {run['instance']:>22} seed {run['seed']}: "
+              f"time {old['total_time']:.2f}s -> {run['total_time']:.2f}s ({speedup:.2f}x), "
+              f"best {old['best_fitness']:.2f} -> {run['best_fitness']:.2f}, "
+              f"rss {old['peak_rss_kb']} -> {run['peak_rss_kb']} KiB")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the GA engines on the tests/ instances.')
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES), choices=ENGINES)
+    parser.add_argument('--instances', default='tests/drone_problem_*.json')
+    parser.add_argument('--population', type=int, default=1000)
+    parser.add_argument('--generations', type=int, default=100)
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0])
+    parser.add_argument('--target-gap', type=float, default=0.05,
+                        help='time-to-target is measured to within this gap of the best known fitness')
+    parser.add_argument('--scale', type=int, nargs='*', default=[],
+                        help='also run on synthetic instances with this many cities')
+    parser.add_argument('--output', default='benchmark_report.json')
+    parser.add_argument('--compare', help='previous report to print deltas against')
+    args = parser.parse_args()
+
+    instances = []
+    for instance_path in sorted(glob.glob(args.instances)):
+        with open(instance_path, 'r') as f:
+            data = json.load(f)
+        reference = reference_fitness(instance_path)
+        target = reference * (1 + args.target_gap) if reference is not None else None
+        instances.append((os.path.basename(instance_path), instance_path, data, target))
+
+    with tempfile.TemporaryDirectory() as synthetic_dir:
+        if args.scale:
+            largest = max(instances, key=lambda instance: len(instance[2]['pontos']))
+            for size in args.scale:
+                data = enlarge_instance(largest[2], size, seed=size)
+                instance_path = os.path.join(synthetic_dir, f'synthetic_{size}.json')
+                with open(instance_path, 'w') as f:
+                    json.dump(data, f)
+                instances.append((f'synthetic_{size}', instance_path, data, None))
+
+        runs = []
+        for instance_name, instance_path, data, target in instances:
+            for engine in args.engines:
+                for seed in args.seeds:
+                    run = run_benchmark(engine, instance_name, instance_path, data,
+                                        args.population, args.generations, seed, target)
+                    runs.append(run)
+                    print(f"{engine:>13} {instance_name:>22} seed {seed}: {run['total_time']:.2f}s, "
+                          f"{run['evaluations_per_second']:.0f} evals/s, best {run['best_fitness']:.2f}, "
+                          f"rss {run['peak_rss_kb']} KiB", flush=True)
+
+    report = {
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'settings': vars(args),
+        'runs': runs,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare_reports(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
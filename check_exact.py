@@ -0,0 +1,94 @@
+import argparse
+import itertools
+import random
+import sys
+
+from drone_delivery_cython import DroneDeliveryProblem, Individual
+
+# Checks DroneDeliveryProblem.exact_solution and lower_bound against brute
+# force on random instances small enough to try every route: every order of
+# the cities with every choice of depot returns between them.
+#
+#   python check_exact.py --instances 200
+
+def random_instance(rng, cities):
+    base = {'x': rng.randint(0, 100), 'y': rng.randint(0, 100), 'peso': 0}
+    points = [{'x': rng.randint(0, 100), 'y': rng.randint(0, 100), 'peso': rng.randint(1, 10)}
+              for _ in range(cities)]
+    # From roomy to tight limits, so that some instances need several trips
+    # and some have cities that no trip can serve
+    return {
+        'pontos': [base] + points + [base],
+        'drone_weight': 10,
+        'max_capacity': rng.choice([18, 30, 45, 1000]),
+        'battery_capacity': rng.choice([3000, 6000, 15000, 10 ** 9]),
+    }
+
+def all_routes(cities):
+    if cities == 0:
+        yield []
+        return
+    for order in itertools.permutations(range(1, cities + 1)):
+        for returns in range(1 << (cities - 1)):
+            route = [order[0]]
+            for i in range(1, cities):
+                if returns >> (i - 1) & 1:
+                    route.append(0)
+                route.append(order[i])
+            yield route
+
+def brute_force(problem, cities):
+    """(best fitness of any route, best fitness of a valid route or None)."""
+    best = best_valid = None
+    for route in all_routes(cities):
+        individual = Individual.from_genes(route, problem)
+        if best is None or individual.fitness < best:
+            best = individual.fitness
+        if individual.is_valid and (best_valid is None or individual.fitness < best_valid):
+            best_valid = individual.fitness
+    return best, best_valid
+
+def check(data, cities):
+    """Problems found on one instance, as messages."""
+    problem = DroneDeliveryProblem(data, fitness_cache_size=0)
+    route, fitness = problem.exact_solution()
+    best, best_valid = brute_force(problem, cities)
+    errors = []
+    individual = Individual.from_genes(route, problem)
+    if sorted(city for city in route if city != 0) != list(range(1, cities + 1)):
+        errors.append(f'exact route {route} does not visit every city once')
+    if abs(individual.fitness - fitness) > 1e-6 * max(1.0, abs(fitness)):
+        errors.append(f'exact fitness {fitness} but its route evaluates to {individual.fitness}')
+    if best_valid is not None and abs(fitness - best_valid) > 1e-6 * best_valid:
+        errors.append(f'exact fitness {fitness}, brute force {best_valid}')
+    if problem.lower_bound() > best + 1e-6 * best:
+        errors.append(f'lower bound {problem.lower_bound()} above the best route {best}')
+    return errors
+
+def main():
+    parser = argparse.ArgumentParser(description='Check exact_solution and lower_bound against brute force.')
+    parser.add_argument('--instances', type=int, default=100)
+    parser.add_argument('--min-cities', type=int, default=2)
+    parser.add_argument('--max-cities', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    failures = 0
+    # Nothing to deliver, with and without the closing base point
+    base_only = random_instance(rng, 0)
+    for data in (dict(base_only, pontos=base_only['pontos'][:1]), base_only):
+        for error in check(data, 0):
+            failures += 1
+            print(f"base only ({len(data['pontos'])} points): {error}")
+    for number in range(args.instances):
+        cities = rng.randint(args.min_cities, args.max_cities)
+        data = random_instance(rng, cities)
+        for error in check(data, cities):
+            failures += 1
+            print(f'instance {number} ({cities} cities): {error}')
+    print(f'{args.instances} instances, {failures} failures')
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from drone_delivery_cython import DroneDeliveryProblem, GeneticAlgorithm
+from telemetry import TelemetrySink, load_telemetry
+
+# Checks that a run checkpointed halfway and resumed ends exactly like the
+# same run done in one go: same best route and fitness, same
+# generation_data and same telemetry records (elapsed_time aside). The
+# interrupted run checkpoints at a quarter and at half of the generations, so
+# the history file gets appended to, and its telemetry samples every
+# --every generations, which the resumed run must pick up from the file.
+#
+#   python check_resume.py --instance tests/drone_problem_3.json --generations 60
+
+COMPARED_FIELDS = ('generation', 'valid_count', 'best_fitness', 'worst_fitness', 'mean_fitness')
+
+def new_ga(data, args, **settings):
+    return GeneticAlgorithm(DroneDeliveryProblem(data), population_size=args.population,
+                            generations=args.generations, seed=args.seed,
+                            local_search_elites=args.local_search_elites, **settings)
+
+def telemetry_rows(path):
+    records = load_telemetry(path)
+    return [tuple(record[field].item() for field in COMPARED_FIELDS) for record in records]
+
+def straight_run(data, args, directory):
+    path = os.path.join(directory, 'straight.bin')
+    with TelemetrySink(path, every=args.every) as sink:
+        best = new_ga(data, args, telemetry=sink).run()
+    plain = new_ga(data, args)
+    plain.run()
+    return best, plain.generation_data, telemetry_rows(path)
+
+def resumed_run(data, args, directory):
+    half = args.generations // 2
+    checkpoint = os.path.join(directory, 'checkpoint.pkl')
+    path = os.path.join(directory, 'resumed.bin')
+    # The interrupted run gets past the checkpoint before it stops, so the
+    # resumed one has to drop what was written after it
+    with TelemetrySink(path, every=args.every) as sink:
+        ga = new_ga(data, args, telemetry=sink)
+        ga.initialize()
+        while ga.generation < half + half // 2:
+            ga.step()
+            if ga.generation in (half // 2, half):
+                ga.save_checkpoint(checkpoint)
+    with TelemetrySink(path, append=True) as sink:
+        best = new_ga(data, args, telemetry=sink).resume(checkpoint)
+
+    plain = new_ga(data, args)
+    plain.initialize()
+    while plain.generation < half:
+        plain.step()
+        if plain.generation in (half // 2, half):
+            plain.save_checkpoint(checkpoint)
+    plain = new_ga(data, args)
+    plain.resume(checkpoint)
+    return best, plain.generation_data, telemetry_rows(path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that a resumed run matches an uninterrupted one.')
+    parser.add_argument('--instance', default='tests/drone_problem_3.json')
+    parser.add_argument('--population', type=int, default=200)
+    parser.add_argument('--generations', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--local-search-elites', type=int, default=2)
+    parser.add_argument('--every', type=int, default=3, help='telemetry sampling interval')
+    args = parser.parse_args()
+
+    with open(args.instance, 'r') as f:
+        data = json.load(f)
+    with tempfile.TemporaryDirectory() as directory:
+        straight = straight_run(data, args, directory)
+        resumed = resumed_run(data, args, directory)
+
+    failures = 0
+    for name, expected, actual in zip(('best()', 'generation_data', 'telemetry rows'), straight, resumed):
+        if expected != actual:
+            failures += 1
+            print(f'{name} differs after resuming')
+    print(f'{args.instance}: {args.generations} generations, resumed at {args.generations // 2}, '
+          f'{failures} differences')
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
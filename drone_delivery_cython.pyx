@@ -1,23 +1,248 @@
 # drone_delivery_cython.pyx
 import json
-import random
 import math
 cimport cython
-from libc.math cimport sqrt
+from libc.math cimport sqrt, INFINITY
+from libc.stdlib cimport malloc, free
+from libc.string cimport memset, memcpy
 from cpython cimport array
+from posix.time cimport clock_gettime, timespec, CLOCK_MONOTONIC
 import array
 import time
+import heapq
+import os
+import pickle
+from collections import OrderedDict
 
-cdef dict build_generation_data(list population, int generation):
-    cdef list population_copy = [ind for ind in population.copy() if ind.is_valid]
-    cdef int population_length = len(population_copy)
+CHECKPOINT_MAGIC = b'DRCK'
+CHECKPOINT_VERSION = 3
 
-    return {
-        'generation': generation,
-        'best_fitness': population_copy[0].fitness if population_length > 0 else -1,
-        'worst_fitness': population_copy[-1].fitness if population_length > 0 else -1,
-        'mean_fitness': (sum([ind.fitness for ind in population_copy]) / population_length) if population_length > 0 else -1,
-    }
+# Instances with more points than this keep no distance matrix and restrict
+# mutation to each city's nearest neighbours, see DroneDeliveryProblem
+LARGE_INSTANCE_POINTS = 2000
+# Memory for the keys of the fitness cache; big routes make big keys
+FITNESS_CACHE_BYTES = 256 << 20
+# Instances with at most this many cities are solved exactly, see
+# DroneDeliveryProblem.exact_solution; time and memory double per city
+EXACT_MAX_CITIES = 16
+
+# PCG32 (XSH RR 64/32). The generator state is a plain struct so the
+# operators can draw from it in C, without the GIL; RandomStream owns one
+# and is what the rest of the module passes around. Streams with different
+# increments are independent, which is how workers and islands get their own.
+cdef struct RandomState:
+    unsigned long long state
+    unsigned long long increment
+
+cdef inline unsigned int random_next(RandomState* rng) noexcept nogil:
+    cdef unsigned long long old = rng.state
+    rng.state = old * 6364136223846793005ULL + rng.increment
+    cdef unsigned int xorshifted = <unsigned int>(((old >> 18) ^ old) >> 27)
+    cdef unsigned int rotation = <unsigned int>(old >> 59)
+    return (xorshifted >> rotation) | (xorshifted << ((32 - rotation) & 31))
+
+cdef inline double random_double(RandomState* rng) noexcept nogil:
+    # 53 random bits in [0, 1), like random.random
+    cdef unsigned long long a = random_next(rng) >> 5, b = random_next(rng) >> 6
+    return (a * 67108864.0 + b) / 9007199254740992.0
+
+@cython.cdivision(True)
+cdef inline unsigned int random_below(RandomState* rng, unsigned int n) noexcept nogil:
+    # Unbiased integer in [0, n) by multiply and shift, redrawing the few
+    # values that would make some results more likely (Lemire's method)
+    cdef unsigned long long product = <unsigned long long>random_next(rng) * n
+    cdef unsigned int low = <unsigned int>product, threshold
+    if low < n:
+        threshold = (0U - n) % n
+        while low < threshold:
+            product = <unsigned long long>random_next(rng) * n
+            low = <unsigned int>product
+    return <unsigned int>(product >> 32)
+
+cdef class RandomStream:
+    cdef RandomState rng
+
+    def __init__(self, seed=None, unsigned long long stream=0):
+        """A seeded generator; seed=None draws the seed from the operating system."""
+        if seed is None:
+            seed = int.from_bytes(os.urandom(8), 'little')
+        self.rng.state = 0
+        self.rng.increment = (stream << 1) | 1
+        random_next(&self.rng)
+        self.rng.state += <unsigned long long>(seed & 0xFFFFFFFFFFFFFFFF)
+        random_next(&self.rng)
+
+    def random(self):
+        return random_double(&self.rng)
+
+    def randrange(self, unsigned int n):
+        if n == 0:
+            raise ValueError('empty range for randrange()')
+        return random_below(&self.rng, n)
+
+    def shuffle(self, list items):
+        cdef Py_ssize_t i, j
+        for i in range(len(items) - 1, 0, -1):
+            j = random_below(&self.rng, <unsigned int>(i + 1))
+            items[i], items[j] = items[j], items[i]
+
+    def spawn(self, int count):
+        """count new independent streams, seeded from this one."""
+        cdef list streams = []
+        cdef unsigned long long seed, stream
+        for _ in range(count):
+            seed = (<unsigned long long>random_next(&self.rng) << 32) | random_next(&self.rng)
+            stream = (<unsigned long long>random_next(&self.rng) << 32) | random_next(&self.rng)
+            streams.append(RandomStream(seed, stream))
+        return streams
+
+    def getstate(self):
+        return self.rng.state, self.rng.increment
+
+    def setstate(self, state):
+        self.rng.state, self.rng.increment = state
+
+    def __reduce__(self):
+        return RandomStream, (0, 0), self.getstate()
+
+    def __setstate__(self, state):
+        self.setstate(state)
+
+# Optional per-stage instrumentation. A GeneticAlgorithm with a Profiler
+# makes it the module's active_profiler while it works, and every timed
+# stage checks that pointer first, so without one the cost is a compare.
+# Stages are exclusive: crossover excludes the child's mutation and
+# fitness, which are timed on their own.
+cdef enum:
+    STAGE_SELECTION
+    STAGE_TOURNAMENT
+    STAGE_CROSSOVER
+    STAGE_MUTATION
+    STAGE_FITNESS
+    STAGE_LOCAL_SEARCH
+    STAGE_TELEMETRY
+    STAGE_COUNT
+
+STAGE_NAMES = ('selection', 'tournament', 'crossover', 'mutation', 'fitness', 'local_search', 'telemetry')
+
+cdef inline long long now_ns() noexcept nogil:
+    cdef timespec ts
+    clock_gettime(CLOCK_MONOTONIC, &ts)
+    return ts.tv_sec * 1000000000LL + ts.tv_nsec
+
+cdef class Profiler:
+    cdef long long calls[STAGE_COUNT]
+    cdef long long nanoseconds[STAGE_COUNT]
+    cdef long long generation_calls[STAGE_COUNT]
+    cdef long long generation_nanoseconds[STAGE_COUNT]
+    cdef readonly long long evaluations
+    cdef readonly long long penalty_hits
+    cdef readonly int generations
+    cdef long long generation_evaluations
+    cdef long long generation_penalty_hits
+    cdef object trace
+
+    def __init__(self, trace_path=None):
+        """Counts and times the GA stages; with trace_path, also writes one JSON line per generation there."""
+        cdef int stage
+        for stage in range(STAGE_COUNT):
+            self.calls[stage] = 0
+            self.nanoseconds[stage] = 0
+            self.generation_calls[stage] = 0
+            self.generation_nanoseconds[stage] = 0
+        self.evaluations = 0
+        self.penalty_hits = 0
+        self.generations = 0
+        self.generation_evaluations = 0
+        self.generation_penalty_hits = 0
+        self.trace = open(trace_path, 'w') if trace_path is not None else None
+
+    cdef inline void add(self, int stage, long long start) noexcept:
+        cdef long long elapsed = now_ns() - start
+        self.generation_calls[stage] += 1
+        self.generation_nanoseconds[stage] += elapsed
+
+    cdef inline void count_evaluation(self, bint is_valid) noexcept:
+        self.generation_evaluations += 1
+        if not is_valid:
+            self.generation_penalty_hits += 1
+
+    cdef void end_generation(self, int generation, list population):
+        cdef int stage
+        cdef Individual individual
+        if self.trace is not None:
+            self.trace.write(json.dumps({
+                'generation': generation,
+                'stages': {STAGE_NAMES[stage]: [self.generation_calls[stage], self.generation_nanoseconds[stage] / 1e9]
+                           for stage in range(STAGE_COUNT) if self.generation_calls[stage] > 0},
+                'evaluations': self.generation_evaluations,
+                'penalty_hits': self.generation_penalty_hits,
+                'unique_routes': len({individual.genes.tobytes() for individual in population}),
+            }, separators=(',', ':')) + '\n')
+        for stage in range(STAGE_COUNT):
+            self.calls[stage] += self.generation_calls[stage]
+            self.nanoseconds[stage] += self.generation_nanoseconds[stage]
+            self.generation_calls[stage] = 0
+            self.generation_nanoseconds[stage] = 0
+        self.evaluations += self.generation_evaluations
+        self.penalty_hits += self.generation_penalty_hits
+        self.generation_evaluations = 0
+        self.generation_penalty_hits = 0
+        self.generations += 1
+
+    def summary(self):
+        """Totals so far: {stage: (calls, seconds)} plus evaluation counts."""
+        cdef int stage
+        return {
+            'stages': {STAGE_NAMES[stage]: (self.calls[stage], self.nanoseconds[stage] / 1e9)
+                       for stage in range(STAGE_COUNT)},
+            'generations': self.generations,
+            'evaluations': self.evaluations,
+            'penalty_hits': self.penalty_hits,
+        }
+
+    def report(self):
+        """summary() as a small table, slowest stage first."""
+        summary = self.summary()
+        total = sum(seconds for _, seconds in summary['stages'].values()) or 1.0
+        lines = [f"{'stage':<14}{'calls':>12}{'seconds':>10}{'share':>8}"]
+        for name, (calls, seconds) in sorted(summary['stages'].items(), key=lambda item: -item[1][1]):
+            lines.append(f'{name:<14}{calls:>12}{seconds:>10.3f}{seconds / total:>8.1%}')
+        lines.append(f"{summary['generations']} generations, {summary['evaluations']} evaluations, "
+                     f"{summary['penalty_hits']} with penalties")
+        return '\n'.join(lines)
+
+    def close(self):
+        if self.trace is not None and not self.trace.closed:
+            self.trace.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+cdef Profiler active_profiler = None
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef tuple population_stats(list population):
+    # One pass over the valid individuals: (count, best, worst, mean), -1 when there are none
+    cdef Individual individual
+    cdef int valid_count = 0
+    cdef double best = 0, worst = 0, total = 0
+    for individual in population:
+        if not individual.is_valid:
+            continue
+        if valid_count == 0 or individual.fitness < best:
+            best = individual.fitness
+        if valid_count == 0 or individual.fitness > worst:
+            worst = individual.fitness
+        total += individual.fitness
+        valid_count += 1
+    if valid_count == 0:
+        return 0, -1, -1, -1
+    return valid_count, best, worst, total / valid_count
 
 cdef class Point:
     cdef public double x
@@ -29,110 +254,1392 @@ cdef class Point:
         self.y = y
         self.weight = weight
 
-cdef class DroneDeliveryProblem:
-    cdef public list points
-    cdef public Point base
-    cdef public double drone_weight
-    cdef public double max_capacity
-    cdef public double battery_capacity
-    cdef public bint viable_solution
+cdef class MutationController:
+    # Adaptive mutation state of one GA run. It used to live on the problem,
+    # which kept one problem from being shared by several runs at once.
     cdef public double mutation_rate
+    cdef public bint viable_solution
+
+    def __init__(self, double mutation_rate=0.8):
+        self.mutation_rate = mutation_rate
+        self.viable_solution = False
+
+    cpdef void register_fitness(self, bint is_valid):
+        # The first valid route calms the mutation rate down
+        if not self.viable_solution and is_valid:
+            self.viable_solution = True
+            self.mutation_rate = 0.1
+
+    cpdef bint adapt(self, int stagnation_counter):
+        """Once per generation; True when the rate was raised and the stagnation count should restart."""
+        if stagnation_counter > 50:
+            self.mutation_rate = 0.9
+            return True
+        if self.mutation_rate > 0.1:
+            self.mutation_rate -= 0.01
+        return False
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef class SpatialGrid:
+    # Uniform grid over the cities (1..n-2) of an instance, about two per
+    # cell. Nearest-city queries search rings of cells around the query
+    # point until no cell left can hold anything closer than what they
+    # found, so they cost about the same whatever the number of cities.
+    cdef double[::1] xs
+    cdef double[::1] ys
+    cdef double min_x, min_y, size
+    cdef int gx, gy
+    cdef array.array starts  # Cell c holds the cities items[starts[c]:starts[c + 1]]
+    cdef array.array items
+
+    def __init__(self, double[::1] xs, double[::1] ys):
+        cdef int n = xs.shape[0], m = max(n - 2, 1), city, c
+        cdef double max_x, max_y
+        self.xs = xs
+        self.ys = ys
+        self.min_x = max_x = xs[1] if n > 2 else 0
+        self.min_y = max_y = ys[1] if n > 2 else 0
+        for city in range(2, n - 1):
+            self.min_x = min(self.min_x, xs[city])
+            max_x = max(max_x, xs[city])
+            self.min_y = min(self.min_y, ys[city])
+            max_y = max(max_y, ys[city])
+        # The second term keeps thin, line-like instances from getting one cell per unit of length
+        self.size = max(sqrt((max_x - self.min_x) * (max_y - self.min_y) * 2 / m),
+                        max(max_x - self.min_x, max_y - self.min_y) * 2 / m)
+        if self.size <= 0:
+            self.size = 1
+        self.gx = <int>((max_x - self.min_x) / self.size) + 1
+        self.gy = <int>((max_y - self.min_y) / self.size) + 1
+
+        # Counting sort of the cities by cell
+        self.starts = array.clone(int_template, self.gx * self.gy + 1, zero=True)
+        self.items = array.clone(int_template, max(n - 2, 0), zero=False)
+        cdef int* first = self.starts.data.as_ints
+        for city in range(1, n - 1):
+            first[self.cell(xs[city], ys[city]) + 1] += 1
+        for c in range(self.gx * self.gy):
+            first[c + 1] += first[c]
+        for city in range(1, n - 1):
+            c = self.cell(xs[city], ys[city])
+            self.items.data.as_ints[first[c]] = city
+            first[c] += 1
+        for c in range(self.gx * self.gy, 0, -1):
+            first[c] = first[c - 1]
+        first[0] = 0
 
-    def __init__(self, data):
+    cdef inline int cell(self, double x, double y) noexcept:
+        # Clamped, as the base may lie outside the grid
+        cdef int cx = max(0, min(self.gx - 1, <int>((x - self.min_x) / self.size)))
+        cdef int cy = max(0, min(self.gy - 1, <int>((y - self.min_y) / self.size)))
+        return cy * self.gx + cx
+
+    cdef int nearest(self, int i, int count, const unsigned char* skip, int* best, double* best_d) noexcept:
+        """Fills best with the count cities nearest to point i, closest first, and returns how many it found.
+
+        Point i itself and the cities flagged in skip (if not NULL) are left
+        out; ties go to the lower city number, like a stable sort by distance.
+        """
+        cdef double x = self.xs[i], y = self.ys[i], d, bound
+        cdef int c = self.cell(x, y), cx = c % self.gx, cy = c // self.gx
+        cdef int r = 0, row, column, step, p, city, slot, filled = 0
+        cdef int* first = self.starts.data.as_ints
+        if count <= 0:
+            return 0
+        while True:
+            for row in range(max(0, cy - r), min(self.gy - 1, cy + r) + 1):
+                # Whole rows at the top and bottom of the ring, only its two ends in between
+                step = 1 if row == cy - r or row == cy + r else max(1, 2 * r)
+                for column in range(cx - r, cx + r + 1, step):
+                    if column < 0 or column >= self.gx:
+                        continue
+                    c = row * self.gx + column
+                    for p in range(first[c], first[c + 1]):
+                        city = self.items.data.as_ints[p]
+                        if city == i or (skip != NULL and skip[city]):
+                            continue
+                        d = point_distance(x, y, self.xs[city], self.ys[city])
+                        if filled == count:
+                            if not closer(d, city, best_d[count - 1], best[count - 1]):
+                                continue
+                            slot = count - 1
+                        else:
+                            slot = filled
+                            filled += 1
+                        while slot > 0 and closer(d, city, best_d[slot - 1], best[slot - 1]):
+                            best_d[slot] = best_d[slot - 1]
+                            best[slot] = best[slot - 1]
+                            slot -= 1
+                        best_d[slot] = d
+                        best[slot] = city
+            # Lower bound on the distance to any cell outside the rings searched so far
+            bound = INFINITY
+            if cx + r + 1 < self.gx:
+                bound = min(bound, max(0.0, self.min_x + (cx + r + 1) * self.size - x))
+            if cx - r - 1 >= 0:
+                bound = min(bound, max(0.0, x - (self.min_x + (cx - r) * self.size)))
+            if cy + r + 1 < self.gy:
+                bound = min(bound, max(0.0, self.min_y + (cy + r + 1) * self.size - y))
+            if cy - r - 1 >= 0:
+                bound = min(bound, max(0.0, y - (self.min_y + (cy - r) * self.size)))
+            # The slack covers cell boundaries that are off by a rounding error
+            if bound == INFINITY or (filled == count and bound * (1 - 1e-9) > best_d[count - 1]):
+                return filled
+            r += 1
+
+    cdef array.array nearest_cities(self, int count):
+        """The count nearest cities of every point, flat n x count; linear in n where sorting all distances is n² log n."""
+        cdef int i, n = self.xs.shape[0]
+        cdef array.array result = array.clone(int_template, n * count, zero=True)
+        cdef array.array distances = array.clone(double_template, count, zero=False)
+        for i in range(n):
+            self.nearest(i, count, NULL, result.data.as_ints + i * count, distances.data.as_doubles)
+        return result
+
+cdef class DroneDeliveryProblem:
+    # Read-only description of an instance. Evaluating a route has no side
+    # effects besides the memo caches below, so one problem can serve any
+    # number of GA runs, islands or threads at once.
+    cdef readonly list points
+    cdef readonly Point base
+    cdef readonly double drone_weight
+    cdef readonly double max_capacity
+    cdef readonly double battery_capacity
+    cdef readonly int num_points
+    # Large instances keep no distance matrix (it grows with num_points²);
+    # their distances are worked out from the coordinates when needed
+    cdef readonly bint large_instance
+    cdef readonly array.array distance_matrix  # Flat num_points x num_points, row-major; None if large_instance
+    cdef readonly array.array weights
+    cdef double[::1] _distances
+    cdef double[::1] _weights
+    cdef double[::1] _xs
+    cdef double[::1] _ys
+    cdef SpatialGrid grid
+    # LRU cache of canonical route -> (fitness, is_valid), see route_key
+    cdef readonly object fitness_cache
+    cdef readonly int fitness_cache_size
+    cdef readonly long cache_hits
+    cdef readonly long cache_misses
+    # The neighbour_count closest cities of every point, flat num_points x neighbour_count
+    cdef readonly array.array neighbours
+    cdef readonly int neighbour_count
+    # (route, fitness) of exact_solution once it has been worked out
+    cdef tuple _exact
+
+    def __init__(self, data, fitness_cache_size=None, int neighbour_count=10,
+                 large_instance=None):
+        """fitness_cache_size defaults to as many routes as fit in FITNESS_CACHE_BYTES,
+        at most 100000; large_instance defaults to more than LARGE_INSTANCE_POINTS points.
+        """
         self.points = [Point(p['x'], p['y'], p['peso']) for p in data['pontos']]
         self.base = self.points[0]  # Assuming first and last points are the base
         self.drone_weight = data['drone_weight']
         self.max_capacity = data['max_capacity']
         self.battery_capacity = data['battery_capacity']
-        self.viable_solution = False
-        self.mutation_rate = 0.8
+        self.large_instance = (len(self.points) > LARGE_INSTANCE_POINTS if large_instance is None
+                               else large_instance)
+        self._build_arrays()
+        self.fitness_cache = OrderedDict()
+        if fitness_cache_size is None:
+            fitness_cache_size = min(100000, FITNESS_CACHE_BYTES // (sizeof(int) * max(1, self.num_points)))
+        self.fitness_cache_size = fitness_cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._build_neighbours(neighbour_count)
 
-    @cython.cdivision(True)
-    cdef double distance(self, Point p1, Point p2):
-        return sqrt((p1.x - p2.x)**2 + (p1.y - p2.y)**2)
+    cdef void _build_neighbours(self, int count):
+        # Cities are 1..n-2; the first and last points are the base
+        self.neighbour_count = max(0, min(count, self.num_points - 3))
+        self.grid = SpatialGrid(self._xs, self._ys)
+        self.neighbours = self.grid.nearest_cities(self.neighbour_count)
+
+    cdef void _build_arrays(self):
+        cdef int i, j, n = len(self.points)
+        self.num_points = n
+        self.weights = array.array('d', [p.weight for p in self.points])
+        self._weights = self.weights
+        self._xs = array.array('d', [p.x for p in self.points])
+        self._ys = array.array('d', [p.y for p in self.points])
+        if self.large_instance:
+            self.distance_matrix = None
+            return
+        self.distance_matrix = array.array('d', [0.0]) * (n * n)
+        self._distances = self.distance_matrix
+        for i in range(n):
+            for j in range(n):
+                self._distances[i * n + j] = point_distance(self._xs[i], self._ys[i], self._xs[j], self._ys[j])
+
+    cpdef double distance(self, int i, int j):
+        """Distance between points i and j."""
+        return pair_distance(self, i, j)
 
     @cython.boundscheck(False)
     @cython.wraparound(False)
-    cpdef double calculate_fitness(self, list path, Individual individual):
-        cdef bint is_viable_solution = True
+    cdef double route_fitness(self, const int* genes, int length, bint* is_valid) noexcept nogil:
+        # Walks [0] + genes + [0] backwards, as the drone's load grows towards the base
         cdef double total_battery_usage = 0
         cdef double current_weight = self.drone_weight
         cdef double current_battery = self.battery_capacity
-        cdef Point current_point, next_point
-        cdef double distance, battery_usage
-        
-        path = [0] + path + [0]  # Start and end with base
-        cdef int i, path_len = len(path)
-
-        for i in range(path_len-1, 0, -1):
-            current_point = self.points[path[i]]
-            next_point = self.points[path[i-1]]
-
-            distance = self.distance(current_point, next_point)
-            battery_usage = distance * current_weight
-            current_weight += next_point.weight
+        cdef double battery_usage
+        cdef int i, current_index = 0, next_index
+
+        is_valid[0] = True
+        for i in range(length, -1, -1):
+            next_index = genes[i-1] if i > 0 else 0
+
+            battery_usage = pair_distance(self, current_index, next_index) * current_weight
+            current_weight += self._weights[next_index]
             total_battery_usage += battery_usage
             current_battery -= battery_usage
 
             if current_battery < 0 or current_weight > self.max_capacity:
                 total_battery_usage += 50000
-                is_viable_solution = False
-                individual.is_valid = False
+                is_valid[0] = False
 
-            if path[i-1] == 0:
+            if next_index == 0:
                 current_weight = self.drone_weight
                 current_battery = self.battery_capacity
+            current_index = next_index
 
-        if not self.viable_solution and is_viable_solution:
-            self.viable_solution = True
-            self.mutation_rate = 0.1
         return total_battery_usage
 
+    cdef tuple cache_lookup(self, bytes key):
+        cdef tuple cached = self.fitness_cache.get(key)
+        if cached is None:
+            self.cache_misses += 1
+        else:
+            self.cache_hits += 1
+            self.fitness_cache.move_to_end(key)
+        return cached
+
+    cdef void cache_store(self, bytes key, double fitness, bint is_valid):
+        self.fitness_cache[key] = (fitness, is_valid)
+        if len(self.fitness_cache) > self.fitness_cache_size:
+            self.fitness_cache.popitem(last=False)
+
+    cpdef double calculate_fitness(self, path, Individual individual=None):
+        cdef array.array genes = as_genes(path)
+        cdef bint is_valid
+        cdef double fitness = self.route_fitness(genes.data.as_ints, len(genes), &is_valid)
+        if individual is not None and not is_valid:
+            individual.is_valid = False
+        return fitness
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cpdef array.array split(self, path):
+        """Route with the best depot returns for the cities of path, visited in their order.
+
+        Split procedure: a shortest path over the trips that cut the city
+        sequence into consecutive pieces, with each trip costed exactly as
+        route_fitness does. A trip stops growing at its first capacity or
+        battery violation, so the result is optimal among routes whose
+        trips are feasible or single cities. O(cities x longest trip).
+        """
+        cdef array.array genes = as_genes(path)
+        cdef int length = len(genes), m = 0, i, j, city, current
+        cdef array.array cities = array.clone(int_template, length, zero=False)
+        cdef int* order = cities.data.as_ints
+        for i in range(length):
+            if genes.data.as_ints[i] != 0:
+                order[m] = genes.data.as_ints[i]
+                m += 1
+        cdef array.array best = array.clone(double_template, m + 1, zero=False)
+        cdef array.array previous = array.clone(int_template, m + 1, zero=False)
+        cdef double* cost = best.data.as_doubles
+        cdef int* start = previous.data.as_ints
+        cdef int violations
+        cdef double weight, battery, usage, step, closing, total
+
+        cost[0] = 0
+        for j in range(1, m + 1):
+            cost[j] = INFINITY
+            # The trip order[i..j-1] is walked backwards like in route_fitness:
+            # base -> order[j-1] -> ... -> order[i] -> base. Moving i down only
+            # adds one step before the closing leg, so every start is O(1).
+            weight = self.drone_weight
+            battery = self.battery_capacity
+            usage = 0
+            violations = 0
+            current = 0
+            for i in range(j - 1, -1, -1):
+                city = order[i]
+                step = pair_distance(self, current, city) * weight
+                weight += self._weights[city]
+                usage += step
+                battery -= step
+                if battery < 0 or weight > self.max_capacity:
+                    violations += 1
+                closing = pair_distance(self, city, 0) * weight
+                total = usage + closing + 50000 * violations
+                if battery - closing < 0 or weight + self._weights[0] > self.max_capacity:
+                    total += 50000
+                if cost[i] + total < cost[j]:
+                    cost[j] = cost[i] + total
+                    start[j] = i
+                if violations > 0:
+                    break
+                current = city
+
+        # Walk the best trips back from the end and write them out in order
+        cdef array.array route = array.clone(int_template, 2 * m, zero=False)
+        cdef int* out = route.data.as_ints
+        cdef int position = 2 * m
+        j = m
+        while j > 0:
+            i = start[j]
+            for city in range(j - 1, i - 1, -1):
+                position -= 1
+                out[position] = order[city]
+            if i > 0:
+                position -= 1
+                out[position] = 0
+            j = i
+        return array.array('i', route[position:])
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cpdef tuple exact_solution(self):
+        """Optimal route and its fitness, by dynamic programming over subsets of cities.
+
+        A first pass finds, for every set of cities, the cheapest order to
+        fly them in as one trip (costed and checked exactly as route_fitness
+        does); a second one picks the partition into such trips with the
+        least total. The route is optimal among routes of feasible trips; a
+        city that no feasible trip can serve gets a trip of its own. Time
+        grows as 2^cities x cities², so instances are limited to
+        EXACT_MAX_CITIES cities.
+        """
+        cdef int m = self.num_points - 2
+        if m > EXACT_MAX_CITIES:
+            raise ValueError(f'exact_solution handles up to {EXACT_MAX_CITIES} cities, this instance has {m}')
+        if self._exact is not None:
+            return self._exact
+        if m <= 0:
+            # Only the base: nothing to deliver
+            self._exact = ([], Individual.from_genes([], self).fitness)
+            return self._exact
+        cdef int full = 1 << m, subset, rest, part, c, d, bit
+        cdef double cost
+        # City c of the subsets is point c + 1. walk[subset * m + c]: least
+        # battery used to fly from the base over subset, ending at c
+        cdef array.array walk_costs = array.clone(double_template, full * m, zero=False)
+        cdef array.array walk_previous = array.clone(byte_template, full * m, zero=False)
+        cdef array.array loads = array.clone(double_template, full, zero=False)
+        cdef array.array trip_costs = array.clone(double_template, full, zero=False)
+        cdef array.array trip_ends = array.clone(byte_template, full, zero=False)
+        cdef double* walk = walk_costs.data.as_doubles
+        cdef signed char* previous = walk_previous.data.as_schars
+        cdef double* load = loads.data.as_doubles
+        cdef double* trip = trip_costs.data.as_doubles
+        cdef signed char* trip_end = trip_ends.data.as_schars
+        cdef bint is_valid
+        cdef int single
+
+        load[0] = self.drone_weight
+        for subset in range(full):
+            if subset > 0:
+                bit = 0
+                while not (subset >> bit) & 1:
+                    bit += 1
+                load[subset] = load[subset & (subset - 1)] + self._weights[bit + 1]
+            trip[subset] = INFINITY
+            for c in range(m):
+                walk[subset * m + c] = INFINITY
+        for c in range(m):
+            cost = pair_distance(self, 0, c + 1) * self.drone_weight
+            if cost <= self.battery_capacity and load[1 << c] <= self.max_capacity:
+                walk[(1 << c) * m + c] = cost
+                previous[(1 << c) * m + c] = -1
+        for subset in range(1, full):
+            for c in range(m):
+                cost = walk[subset * m + c]
+                if cost == INFINITY:
+                    continue
+                # The load already picked up is carried on the next leg
+                for d in range(m):
+                    if (subset >> d) & 1 or load[subset | (1 << d)] > self.max_capacity:
+                        continue
+                    cost = walk[subset * m + c] + pair_distance(self, c + 1, d + 1) * load[subset]
+                    if cost <= self.battery_capacity and cost < walk[(subset | (1 << d)) * m + d]:
+                        walk[(subset | (1 << d)) * m + d] = cost
+                        previous[(subset | (1 << d)) * m + d] = c
+            if load[subset] + self._weights[0] > self.max_capacity:
+                continue
+            for c in range(m):
+                cost = walk[subset * m + c] + pair_distance(self, c + 1, 0) * load[subset]
+                if cost <= self.battery_capacity and cost < trip[subset]:
+                    trip[subset] = cost
+                    trip_end[subset] = c
+        for c in range(m):
+            if trip[1 << c] == INFINITY:
+                single = c + 1
+                trip[1 << c] = self.route_fitness(&single, 1, &is_valid)
+                trip_end[1 << c] = c
+                previous[(1 << c) * m + c] = -1
+
+        # Cheapest cover of every set of cities by disjoint trips; the trip
+        # of the lowest uncovered city is chosen among the uncovered ones
+        cdef array.array cover_costs = array.clone(double_template, full, zero=False)
+        cdef array.array cover_trips = array.clone(int_template, full, zero=False)
+        cdef double* cover = cover_costs.data.as_doubles
+        cdef int* chosen = cover_trips.data.as_ints
+        for subset in range(full):
+            cover[subset] = INFINITY
+        cover[0] = 0
+        for subset in range(full - 1):
+            if cover[subset] == INFINITY:
+                continue
+            bit = 0
+            while (subset >> bit) & 1:
+                bit += 1
+            rest = (full - 1) & ~subset & ~(1 << bit)
+            part = rest
+            while True:
+                cost = cover[subset] + trip[part | (1 << bit)]
+                if cost < cover[subset | part | (1 << bit)]:
+                    cover[subset | part | (1 << bit)] = cost
+                    chosen[subset | part | (1 << bit)] = part | (1 << bit)
+                if part == 0:
+                    break
+                part = (part - 1) & rest
+
+        # Trips are written out in genes order, which is the walk reversed
+        cdef list trips = []
+        cdef list genes
+        subset = full - 1
+        while subset > 0:
+            part = chosen[subset]
+            genes = []
+            c = trip_end[part]
+            rest = part
+            while c >= 0:
+                genes.append(c + 1)
+                d = previous[rest * m + c]
+                rest &= ~(1 << c)
+                c = d
+            trips.append(genes)
+            subset &= ~part
+        cdef list route = []
+        for genes in sorted(trips):
+            if route:
+                route.append(0)
+            route.extend(genes)
+        self._exact = (route, Individual.from_genes(route, self).fitness)
+        return self._exact
+
+    cpdef double lower_bound(self):
+        """A fitness no route can beat, in O(points x neighbour_count).
+
+        Every leg carries at least the drone itself, and the legs of a city
+        are at least its two shortest possible ones (two to the base counts);
+        the base has two legs per trip, and there are at least as many trips
+        as capacity forces. On top of that every package is carried at least
+        its straight-line distance to the base.
+        """
+        cdef int n = self.num_points, k = self.neighbour_count, city
+        cdef double first, second, nearest_base = INFINITY, packages = 0, legs = 0, carried = 0, base
+        if n <= 2:
+            return 0
+        for city in range(1, n - 1):
+            base = pair_distance(self, city, 0)
+            nearest_base = min(nearest_base, base)
+            first = second = base
+            if k > 0:
+                first = min(first, pair_distance(self, city, self.neighbours.data.as_ints[city * k]))
+            if k > 1:
+                second = min(base, pair_distance(self, city, self.neighbours.data.as_ints[city * k + 1]))
+            legs += first + second
+            carried += self._weights[city] * base
+            packages += self._weights[city]
+        room = self.max_capacity - self.drone_weight - self._weights[0]
+        trips = max(1, math.ceil(packages / room)) if room > 0 else 1
+        legs += 2 * trips * nearest_base
+        return self.drone_weight * legs / 2 + carried
+
+cdef array.array int_template = array.array('i', [])
+cdef array.array byte_template = array.array('b', [])
+cdef array.array double_template = array.array('d', [])
+cdef array.array uint_template = array.array('I', [])
+cdef enum:
+    TRIP_ORDER_INSERTION_MAX = 32  # trips; above this trip_order buckets them
+
+cdef inline double point_distance(double x1, double y1, double x2, double y2) noexcept nogil:
+    cdef double dx = x1 - x2, dy = y1 - y2
+    return sqrt(dx * dx + dy * dy)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline double pair_distance(DroneDeliveryProblem problem, int i, int j) noexcept nogil:
+    if problem.large_instance:
+        return point_distance(problem._xs[i], problem._ys[i], problem._xs[j], problem._ys[j])
+    return problem._distances[i * problem.num_points + j]
+
+cdef inline bint closer(double d1, int city1, double d2, int city2) noexcept nogil:
+    # Ties go to the lower city number, like a stable sort by distance
+    return d1 < d2 or (d1 == d2 and city1 < city2)
+
+cdef array.array as_genes(path):
+    if isinstance(path, array.array) and (<array.array>path).typecode == 'i':
+        return path
+    return array.array('i', path)
+
 cdef class Individual:
-    cdef public list path
+    cdef public array.array genes  # int32 route, 0 marks a return to the base
     cdef public DroneDeliveryProblem problem
     cdef public double fitness
     cdef public bint is_valid
+    # Per-trip summaries filled by calculate_fitness or inherited through
+    # crossover, so that unchanged trips are never walked again: mutate and
+    # improve only re-evaluate the trips they touch. None until the first
+    # evaluation.
+    cdef public array.array trip_starts
+    cdef public array.array trip_costs
+    cdef public array.array trip_valid
 
-    def __init__(self, list path, DroneDeliveryProblem problem):
-        self.path = path
+    def __init__(self, path, DroneDeliveryProblem problem, RandomStream rng, double mutation_rate,
+                 bint giant_tour=False, array.array trip_costs=None, array.array trip_valid=None):
+        """trip_costs and trip_valid, when given, hold what is already known about
+        the trips of path (trip_valid -1 where nothing is): only the other trips
+        are evaluated, and the mutation then re-evaluates just the trips it touches.
+        """
+        cdef int k
+        cdef bint evaluated = False
+        cdef Profiler profiler = active_profiler
+        cdef long long start = now_ns() if profiler is not None else 0
+        self.genes = as_genes(path)
         self.problem = problem
         self.fitness = 0.0
         self.is_valid = True
         self.normalize()
-        if random.random() < self.problem.mutation_rate:
-            self.mutate()
-        self.calculate_fitness()
+        if giant_tour:
+            # Only the city order is inherited; split puts the depot returns
+            # back, so the mutation is a swap of two cities
+            if random_double(&rng.rng) < mutation_rate:
+                self._swap_cities(&rng.rng)
+                if profiler is not None:
+                    profiler.add(STAGE_MUTATION, start)
+                    start = now_ns()
+            self.genes = problem.split(self.genes)
+        else:
+            if trip_costs is not None:
+                self._find_trips()
+                self.trip_costs = trip_costs
+                self.trip_valid = trip_valid
+                for k in range(len(trip_valid)):
+                    if trip_valid.data.as_schars[k] < 0:
+                        self._update_trip(k)
+                self._sum_trips()
+                evaluated = True
+                if profiler is not None:
+                    profiler.add(STAGE_FITNESS, start)
+                    start = now_ns()
+            if random_double(&rng.rng) < mutation_rate:
+                # mutate leaves the fitness up to date
+                self.mutate(rng)
+                evaluated = True
+                if profiler is not None:
+                    profiler.add(STAGE_MUTATION, start)
+        # Each stage is only counted when it ran, and every child is one evaluation
+        if not evaluated:
+            self.calculate_fitness()
+            if profiler is not None:
+                profiler.add(STAGE_FITNESS, start)
+        if profiler is not None:
+            profiler.count_evaluation(self.is_valid)
+
+    @staticmethod
+    def from_genes(path, DroneDeliveryProblem problem):
+        """Builds an evaluated individual without the random mutation of __init__."""
+        cdef Individual individual = Individual.__new__(Individual)
+        individual.genes = array.copy(as_genes(path))
+        individual.problem = problem
+        individual.is_valid = True
+        individual.normalize()
+        individual.calculate_fitness()
+        return individual
+
+    @staticmethod
+    def restore(path, double fitness, bint is_valid, DroneDeliveryProblem problem):
+        """Rebuilds an individual from a known route and fitness without evaluating it."""
+        cdef Individual individual = Individual.__new__(Individual)
+        individual.genes = as_genes(path)
+        individual.problem = problem
+        individual.fitness = fitness
+        individual.is_valid = is_valid
+        return individual
 
+    @property
+    def path(self):
+        return self.genes.tolist()
+
+    @path.setter
+    def path(self, path):
+        self.genes = array.array('i', path)
+        self.trip_costs = None
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
     cpdef void calculate_fitness(self):
-        self.fitness = self.problem.calculate_fitness(self.path, self)
-
-    cpdef void mutate(self):
-        cdef int i, j
-        if random.random() < 0.5:
-            if random.random() < 0.5:
-                i = random.randint(1, len(self.path) - 1)
-                self.path.insert(i, 0)
+        cdef bytes key = None
+        cdef tuple cached
+        self._find_trips()
+
+        if self.problem.fitness_cache_size > 0:
+            key = route_key(self.genes, self.trip_starts)
+            cached = self.problem.cache_lookup(key)
+            if cached is not None:
+                # No per-trip summaries on a hit; mutate falls back to the full path
+                self.trip_costs = None
+                self.fitness, self.is_valid = cached
+                return
+
+        self._evaluate_trips()
+        if key is not None:
+            self.problem.cache_store(key, self.fitness, self.is_valid)
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef void _find_trips(self):
+        cdef int* genes = self.genes.data.as_ints
+        cdef int i, count = 0, length = len(self.genes)
+        self.trip_starts = array.clone(int_template, length // 2 + 1, zero=False)
+        cdef int* starts = self.trip_starts.data.as_ints
+        for i in range(length):
+            if i == 0 or genes[i - 1] == 0:
+                starts[count] = i
+                count += 1
+        array.resize(self.trip_starts, count)
+
+    cdef void _evaluate_trips(self):
+        cdef int i, count = len(self.trip_starts)
+        self.trip_costs = array.clone(double_template, count, zero=False)
+        self.trip_valid = array.clone(byte_template, count, zero=False)
+        for i in range(count):
+            self._update_trip(i)
+        self._sum_trips()
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef void _update_trip(self, int k):
+        cdef int* starts = self.trip_starts.data.as_ints
+        cdef int count = len(self.trip_starts)
+        cdef int end = starts[k + 1] - 1 if k + 1 < count else len(self.genes)
+        cdef bint is_valid
+        self.trip_costs.data.as_doubles[k] = self.problem.route_fitness(
+            self.genes.data.as_ints + starts[k], end - starts[k], &is_valid)
+        self.trip_valid.data.as_schars[k] = is_valid
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef void _sum_trips(self):
+        # Trips are summed in canonical order (by first city) so the fitness
+        # does not depend on trip order and cached values are exact
+        cdef double* costs = self.trip_costs.data.as_doubles
+        cdef signed char* valid = self.trip_valid.data.as_schars
+        cdef int k, count = len(self.trip_costs)
+        cdef array.array order = array.clone(int_template, count, zero=False)
+        trip_order(self.genes.data.as_ints, self.trip_starts.data.as_ints, count, order.data.as_ints)
+        self.fitness = 0.0
+        self.is_valid = True
+        for k in range(count):
+            self.fitness += costs[order.data.as_ints[k]]
+            if not valid[k]:
+                self.is_valid = False
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef int _trip_of(self, int position):
+        # Binary search for the trip whose start is the last one <= position
+        cdef int* starts = self.trip_starts.data.as_ints
+        cdef int low = 0, high = len(self.trip_starts) - 1, middle
+        while low < high:
+            middle = (low + high + 1) // 2
+            if starts[middle] <= position:
+                low = middle
             else:
-                zero_indexes = [i for i, x in enumerate(self.path) if x == 0]
-                if len(zero_indexes) > 1:
-                    self.path.pop(random.choice(zero_indexes))
-        else:
-            city_indexes = [i for i, x in enumerate(self.path) if x != 0]
-            if len(city_indexes) > 1:
-                i, j = random.sample(city_indexes, 2)
-                self.path[i], self.path[j] = self.path[j], self.path[i]
+                high = middle - 1
+        return low
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cpdef int improve(self, int max_rounds=10):
+        """Local search with 2-opt and city relocation, returns the number of moves made.
+
+        Only pairs of a city and one of its problem.neighbours are tried, and
+        every candidate is scored by re-walking the one or two trips it
+        changes, so the battery cost direction and load are respected.
+        """
+        cdef DroneDeliveryProblem problem = self.problem
+        cdef int n = problem.num_points, k = problem.neighbour_count
+        cdef int* neighbours = problem.neighbours.data.as_ints
+        cdef int rounds, a, b, c, moves = 0
+        cdef bint improved
+        cdef array.array positions = array.clone(int_template, n, zero=False)
+        cdef array.array scratch = array.clone(int_template, 2 * len(self.genes) + 2, zero=False)
+        if self.trip_costs is None:
+            self._find_trips()
+            self._evaluate_trips()
+
+        for rounds in range(max_rounds):
+            improved = False
+            self._index_positions(positions)
+            for a in range(1, n):
+                if positions.data.as_ints[a] < 0:
+                    continue
+                for c in range(k):
+                    b = neighbours[a * k + c]
+                    if positions.data.as_ints[b] < 0:
+                        continue
+                    if (self._try_two_opt(a, b, positions)
+                            or self._try_relocate(a, b, True, positions, scratch)
+                            or self._try_relocate(a, b, False, positions, scratch)):
+                        improved = True
+                        moves += 1
+                        break
+            if not improved:
+                break
+        return moves
 
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef void _index_positions(self, array.array positions):
+        cdef int* genes = self.genes.data.as_ints
+        cdef int i
+        for i in range(len(positions)):
+            positions.data.as_ints[i] = -1
+        for i in range(len(self.genes)):
+            if genes[i] != 0:
+                positions.data.as_ints[genes[i]] = i
+
+    cdef inline int _trip_end(self, int k):
+        return self.trip_starts.data.as_ints[k + 1] - 1 if k + 1 < len(self.trip_starts) else len(self.genes)
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef bint _try_two_opt(self, int a, int b, array.array positions):
+        # Reverses the stretch after a up to b (or b up to a) inside one trip;
+        # for neighbours next to each other this swaps them
+        cdef int* genes = self.genes.data.as_ints
+        cdef int i = positions.data.as_ints[a], j = positions.data.as_ints[b]
+        cdef int trip = self._trip_of(i), start, end, low, high
+        cdef double cost
+        cdef bint is_valid
+        if self._trip_of(j) != trip:
+            return False
+        low = min(i, j)
+        high = max(i, j)
+        if high - low > 1:
+            low += 1
+        start = self.trip_starts.data.as_ints[trip]
+        end = self._trip_end(trip)
+        reverse_genes(genes, low, high)
+        cost = self.problem.route_fitness(genes + start, end - start, &is_valid)
+        if cost < self.trip_costs.data.as_doubles[trip] - 1e-9:
+            self.trip_costs.data.as_doubles[trip] = cost
+            self.trip_valid.data.as_schars[trip] = is_valid
+            for i in range(low, high + 1):
+                positions.data.as_ints[genes[i]] = i
+            self._sum_trips()
+            return True
+        reverse_genes(genes, low, high)
+        return False
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef bint _try_relocate(self, int a, int b, bint after, array.array positions, array.array scratch):
+        # Moves a right after (or right before) b, possibly into b's trip
+        cdef int* genes = self.genes.data.as_ints
+        cdef int* buffer = scratch.data.as_ints
+        cdef int i = positions.data.as_ints[a], j = positions.data.as_ints[b]
+        cdef int trip_a = self._trip_of(i), trip_b = self._trip_of(j)
+        cdef int p, written = 0, written_a = 0, start_a, end_a, start_b, end_b
+        cdef double old_cost, new_cost, cost_a = 0.0, cost_b
+        cdef bint valid_a = True, valid_b
+        if (after and j + 1 == i) or (not after and j - 1 == i):
+            return False
+        start_b = self.trip_starts.data.as_ints[trip_b]
+        end_b = self._trip_end(trip_b)
+        # b's trip with a moved next to b (a is skipped if it was already there)
+        for p in range(start_b, end_b):
+            if p == i:
+                continue
+            if not after and p == j:
+                buffer[written] = a
+                written += 1
+            buffer[written] = genes[p]
+            written += 1
+            if after and p == j:
+                buffer[written] = a
+                written += 1
+        cost_b = self.problem.route_fitness(buffer, written, &valid_b)
+        new_cost = cost_b
+        old_cost = self.trip_costs.data.as_doubles[trip_b]
+        if trip_a != trip_b:
+            # a's trip without a
+            start_a = self.trip_starts.data.as_ints[trip_a]
+            end_a = self._trip_end(trip_a)
+            for p in range(start_a, end_a):
+                if p != i:
+                    buffer[written + written_a] = genes[p]
+                    written_a += 1
+            if written_a > 0:
+                cost_a = self.problem.route_fitness(buffer + written, written_a, &valid_a)
+                new_cost += cost_a
+            old_cost += self.trip_costs.data.as_doubles[trip_a]
+        if new_cost >= old_cost - 1e-9:
+            return False
+
+        self.genes.pop(i)
+        if j > i:
+            j -= 1
+        self.genes.insert(j + 1 if after else j, a)
         self.normalize()
+        self._find_trips()
+        # Only trip_a and trip_b changed and both were just walked, so the
+        # other trips keep their summaries; an emptied trip_a is dropped
+        self._moved_trips(trip_a, cost_a, valid_a, written_a == 0, trip_b, cost_b, valid_b)
+        self._index_positions(positions)
+        return True
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef void _moved_trips(self, int trip_a, double cost_a, bint valid_a, bint emptied,
+                           int trip_b, double cost_b, bint valid_b):
+        cdef double* costs = self.trip_costs.data.as_doubles
+        cdef signed char* valid = self.trip_valid.data.as_schars
+        cdef int k, kept = 0, count = len(self.trip_costs)
+        costs[trip_b] = cost_b
+        valid[trip_b] = valid_b
+        if trip_a != trip_b:
+            costs[trip_a] = cost_a
+            valid[trip_a] = valid_a
+        if emptied and trip_a != trip_b:
+            for k in range(count):
+                if k != trip_a:
+                    costs[kept] = costs[k]
+                    valid[kept] = valid[k]
+                    kept += 1
+            array.resize(self.trip_costs, kept)
+            array.resize(self.trip_valid, kept)
+        self._sum_trips()
 
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cpdef void mutate(self, RandomStream rng):
+        cdef RandomState* state = &rng.rng
+        cdef int* genes = self.genes.data.as_ints
+        cdef int length = len(self.genes)
+        cdef int i = 0, j, k, zeros = 0
+        cdef int* starts
+        # Only the trips touched by the move are re-evaluated once the
+        # individual already has trip summaries (genes stay normalized),
+        # otherwise the whole route is; either way fitness is current after
+        cdef bint incremental = self.trip_costs is not None
+        for i in range(length):
+            if genes[i] == 0:
+                zeros += 1
+
+        if random_double(state) < 0.5:
+            if random_double(state) < 0.5:
+                i = 1 + random_below(state, length - 1) if length > 1 else 0
+                # A 0 next to another 0 would just be normalized away again
+                if i > 0 and genes[i - 1] != 0 and genes[i] != 0:
+                    self.genes.insert(i, 0)
+                    if incremental:
+                        # Split trip k at i into k and k + 1
+                        k = self._trip_of(i - 1)
+                        self.trip_starts.insert(k + 1, i)
+                        starts = self.trip_starts.data.as_ints
+                        for j in range(k + 1, len(self.trip_starts)):
+                            starts[j] += 1
+                        self.trip_costs.insert(k + 1, 0.0)
+                        self.trip_valid.insert(k + 1, 0)
+                        self._update_trip(k)
+                        self._update_trip(k + 1)
+                        self._sum_trips()
+            elif zeros > 1:
+                # take out a random 0
+                k = random_below(state, zeros)
+                for i in range(length):
+                    if genes[i] == 0:
+                        if k == 0:
+                            break
+                        k -= 1
+                self.genes.pop(i)
+                if incremental:
+                    # Merge trip k with the trip after it
+                    k = self._trip_of(i - 1)
+                    self.trip_starts.pop(k + 1)
+                    starts = self.trip_starts.data.as_ints
+                    for j in range(k + 1, len(self.trip_starts)):
+                        starts[j] -= 1
+                    self.trip_costs.pop(k + 1)
+                    self.trip_valid.pop(k + 1)
+                    self._update_trip(k)
+                    self._sum_trips()
+        elif length - zeros > 1:
+            # select two random cities and swap them
+            i = random_below(state, length - zeros)
+            if uses_candidates(self.problem):
+                i = nth_city(genes, length, i)
+                j = candidate_position(self.problem, genes, length, i, state)
+            else:
+                j = random_below(state, length - zeros - 1)
+                j += j >= i
+                i = nth_city(genes, length, i)
+                j = nth_city(genes, length, j)
+            genes[i], genes[j] = genes[j], genes[i]
+            if incremental:
+                k = self._trip_of(i)
+                self._update_trip(k)
+                if self._trip_of(j) != k:
+                    self._update_trip(self._trip_of(j))
+                self._sum_trips()
+
+        if not incremental:
+            self.normalize()
+            self.calculate_fitness()
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
     cpdef void normalize(self):
-        cdef int i = 0
-        while i < len(self.path):
-            if self.path[i] == 0 and (i == 0 or i == len(self.path) - 1 or self.path[i - 1] == 0):
-                self.path.pop(i)
-                i-=1
+        # Drops leading, trailing and repeated 0s in a single pass
+        cdef int* genes = self.genes.data.as_ints
+        cdef int length = len(self.genes)
+        cdef int i, kept = 0
+        for i in range(length):
+            if genes[i] == 0 and (kept == 0 or genes[kept - 1] == 0):
+                continue
+            genes[kept] = genes[i]
+            kept += 1
+        if kept > 0 and genes[kept - 1] == 0:
+            kept -= 1
+        if kept != length:
+            array.resize(self.genes, kept)
+
+    cdef void _swap_cities(self, RandomState* state):
+        # Swaps two cities, leaving the depot returns where they are
+        cdef int* genes = self.genes.data.as_ints
+        cdef int length = len(self.genes), i, j
+        cdef int cities = length - count_zeros(genes, length)
+        if cities < 2:
+            return
+        i = random_below(state, cities)
+        if uses_candidates(self.problem):
+            i = nth_city(genes, length, i)
+            j = candidate_position(self.problem, genes, length, i, state)
+        else:
+            j = random_below(state, cities - 1)
+            j += j >= i
+            i = nth_city(genes, length, i)
+            j = nth_city(genes, length, j)
+        genes[i], genes[j] = genes[j], genes[i]
+
+cdef inline void reverse_genes(int* genes, int low, int high) noexcept:
+    while low < high:
+        genes[low], genes[high] = genes[high], genes[low]
+        low += 1
+        high -= 1
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void trip_order(const int* genes, const int* starts, int count, int* order) noexcept:
+    # Insertion sort of trip indices by first city; cities are unique so
+    # the first city alone gives a canonical order. Routes with many trips
+    # (large instances) are bucketed by first city instead.
+    cdef int i, j, trip, largest = 0
+    cdef int* slots = NULL
+    if count > TRIP_ORDER_INSERTION_MAX:
+        for i in range(count):
+            largest = max(largest, genes[starts[i]])
+        slots = <int*>malloc((largest + 1) * sizeof(int))
+    if slots != NULL:
+        memset(slots, -1, (largest + 1) * sizeof(int))
+        for i in range(count):
+            slots[genes[starts[i]]] = i
+        j = 0
+        for i in range(largest + 1):
+            if slots[i] >= 0:
+                order[j] = slots[i]
+                j += 1
+        free(slots)
+        if j == count:
+            return
+    for i in range(count):
+        trip = i
+        j = i
+        while j > 0 and genes[starts[order[j - 1]]] > genes[starts[trip]]:
+            order[j] = order[j - 1]
+            j -= 1
+        order[j] = trip
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef bytes route_key(array.array genes, array.array trip_starts):
+    """Canonical form of a normalized route: its trips sorted by first city, 0-separated."""
+    cdef int* data = genes.data.as_ints
+    cdef int* starts = trip_starts.data.as_ints
+    cdef int i, k, trip, end, length = len(genes), count = len(trip_starts), written = 0
+    cdef array.array order = array.clone(int_template, count, zero=False)
+    cdef array.array key = array.clone(int_template, length, zero=False)
+    trip_order(data, starts, count, order.data.as_ints)
+    for k in range(count):
+        trip = order.data.as_ints[k]
+        end = starts[trip + 1] - 1 if trip + 1 < count else length
+        if k > 0:
+            key.data.as_ints[written] = 0
+            written += 1
+        for i in range(starts[trip], end):
+            key.data.as_ints[written] = data[i]
+            written += 1
+    return key.tobytes()
+
+cdef inline int count_zeros(const int* genes, int length) noexcept:
+    cdef int i, zeros = 0
+    for i in range(length):
+        if genes[i] == 0:
+            zeros += 1
+    return zeros
+
+cdef inline int nth_city(const int* genes, int length, int n) noexcept:
+    cdef int i
+    for i in range(length):
+        if genes[i] != 0:
+            if n == 0:
+                return i
+            n -= 1
+    return -1
+
+cdef inline bint uses_candidates(DroneDeliveryProblem problem) noexcept:
+    # On large instances a swap with a random city far away almost never
+    # pays off, so swaps stay within the candidate lists
+    return problem.large_instance and problem.neighbour_count > 0
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int candidate_position(DroneDeliveryProblem problem, const int* genes, int length, int i,
+                            RandomState* state) noexcept:
+    # Position of one of the neighbour_count nearest cities of genes[i], drawn at random
+    cdef int k = problem.neighbour_count
+    cdef int city = problem.neighbours.data.as_ints[genes[i] * k + random_below(state, k)], j
+    for j in range(length):
+        if genes[j] == city:
+            return j
+    return i
+
+cdef int split_subroutes(array.array genes, int* starts, int* ends, int* ids) noexcept:
+    # Fills the [start, end) bounds and the number of every trip and
+    # returns how many there are
+    cdef int* data = genes.data.as_ints
+    cdef int i, count = 0, length = len(genes), start = 0
+    for i in range(length + 1):
+        if i == length or data[i] == 0:
+            if i > start:
+                starts[count] = start
+                ends[count] = i
+                ids[count] = count
+                count += 1
+            start = i + 1
+    return count
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int take_subroute(const int* genes, int* starts, int* ends, int* ids, int count, int k,
+                       signed char* already_added, int* child, int child_length) noexcept:
+    # Appends trip k (minus cities already in the child) and a 0 unless
+    # nothing of it was left, then swap-removes it from the remaining trips
+    cdef int i, city, length = child_length
+    for i in range(starts[k], ends[k]):
+        city = genes[i]
+        if not already_added[city]:
+            already_added[city] = 1
+            child[child_length] = city
+            child_length += 1
+    starts[k] = starts[count - 1]
+    ends[k] = ends[count - 1]
+    ids[k] = ids[count - 1]
+    if child_length == length:
+        return child_length
+    child[child_length] = 0
+    return child_length + 1
+
+cdef inline int inherit_trip(Individual parent, int k, int size, int taken,
+                             double* costs, signed char* valid, int trips) noexcept:
+    # Records the child trip take_subroute just appended (taken genes, its 0
+    # included) from the parent's trip k: the parent's cost if the whole
+    # trip came through, -1 validity (still to evaluate) otherwise
+    if taken == 0:
+        return trips
+    if taken - 1 == size and parent.trip_costs is not None:
+        costs[trips] = parent.trip_costs.data.as_doubles[k]
+        valid[trips] = parent.trip_valid.data.as_schars[k]
+    else:
+        valid[trips] = -1
+    return trips + 1
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef array.array draw_tournaments(RandomStream rng, int n, int tournaments, int size):
+    # Entrant indices for all tournaments of a generation in one pass.
+    # Repeats inside a tournament are redrawn, so every tournament is a
+    # sample without replacement like random.sample.
+    cdef int i, j, total = tournaments * size
+    cdef array.array draws = array.clone(uint_template, total, zero=False)
+    cdef unsigned int* entrants = draws.data.as_uints
+    cdef RandomState* state = &rng.rng
+    cdef bint repeated
+    with nogil:
+        for i in range(total):
+            entrants[i] = random_below(state, n)
+            repeated = True
+            while repeated:
+                repeated = False
+                for j in range(i - i % size, i):
+                    if entrants[j] == entrants[i]:
+                        entrants[i] = random_below(state, n)
+                        repeated = True
+                        break
+    return draws
+
+cdef inline int tournament_winner(const double* fitness, const unsigned int* entrants, int size) noexcept:
+    cdef int i, winner = entrants[0]
+    for i in range(1, size):
+        if fitness[entrants[i]] < fitness[winner]:
+            winner = entrants[i]
+    return winner
+
+# Constructive routes for warm-starting the initial population. Both build
+# trips city by city and only keep a trip growing while route_fitness says
+# it is still within capacity and battery, so they start out feasible
+# wherever single-city trips are.
+
+SEEDING_SOURCES = ('nearest_neighbour', 'savings', 'stored')
+
+cdef struct TripSummary:
+    # What the feasibility and cost of an open trip depend on, so that
+    # trips can be extended, joined and reversed in O(1)
+    double usage   # battery used, as route_fitness walks the trip
+    double length  # distance flown, depot legs included
+    double load    # weight of the packages on board at take-off
+    int first
+    int last
+
+cdef inline TripSummary single_trip(DroneDeliveryProblem problem, int city) noexcept:
+    cdef TripSummary trip
+    cdef double distance = pair_distance(problem, 0, city)
+    trip.usage = distance * (2 * problem.drone_weight + problem._weights[city])
+    trip.length = 2 * distance
+    trip.load = problem._weights[city]
+    trip.first = city
+    trip.last = city
+    return trip
+
+cdef inline TripSummary joined_trips(DroneDeliveryProblem problem, TripSummary a, TripSummary b) noexcept:
+    # a then b: a's legs carry b's packages too, and a's flight back to the
+    # depot and b's flight out of it become one leg from a.last to b.first
+    cdef TripSummary trip
+    cdef double back = pair_distance(problem, a.last, 0), out = pair_distance(problem, 0, b.first)
+    cdef double between = pair_distance(problem, a.last, b.first)
+    trip.usage = (a.usage - back * problem.drone_weight + b.load * (a.length - back)
+                  + b.usage + (between - out) * (problem.drone_weight + b.load))
+    trip.length = a.length - back - out + between + b.length
+    trip.load = a.load + b.load
+    trip.first = a.first
+    trip.last = b.last
+    return trip
+
+cdef inline TripSummary reversed_trip(DroneDeliveryProblem problem, TripSummary trip) noexcept:
+    # Every leg carries drone_weight plus what is left to deliver one way and
+    # drone_weight plus what was delivered the other, load in total
+    cdef TripSummary reverse = trip
+    reverse.usage = trip.length * (2 * problem.drone_weight + trip.load) - trip.usage
+    reverse.first = trip.last
+    reverse.last = trip.first
+    return reverse
+
+cdef inline bint cheaper(double usage, double other) noexcept:
+    # usage < other by more than the rounding of adding up the same legs in
+    # another order, so that trips costing the same compare equal
+    return usage < other * (1 - 1e-12)
+
+cdef inline bint trip_fits(DroneDeliveryProblem problem, TripSummary trip) noexcept:
+    # Battery use and weight only grow along the walk, so the end decides
+    return (trip.usage <= problem.battery_capacity
+            and problem.drone_weight + trip.load + problem._weights[0] <= problem.max_capacity)
+
+def nearest_neighbour_route(DroneDeliveryProblem problem, RandomStream rng=None, int choices=3):
+    """Greedy route that always flies to the nearest unvisited city and returns to the base when full.
+
+    With rng the next city is drawn from the `choices` nearest ones instead,
+    so repeated calls give different routes. On large instances the nearest
+    ones are looked up in the candidate lists of problem.neighbours, and
+    only when all of those are visited in the problem's spatial grid.
+    """
+    cdef int n = problem.num_points, k = problem.neighbour_count, current = 0, city, c
+    cdef double distance
+    cdef int wanted = choices if rng is not None else 1, remaining = n - 2
+    cdef list unvisited = list(range(1, n - 1))
+    cdef bytearray visited = bytearray(n)
+    cdef list route = [], trip = [], candidates
+    cdef TripSummary load, grown
+    while remaining > 0:
+        if problem.large_instance:
+            candidates = []
+            for c in range(k):
+                city = problem.neighbours.data.as_ints[current * k + c]
+                if not visited[city]:
+                    candidates.append(city)
+                    if len(candidates) == wanted:
+                        break
+            if not candidates:
+                problem.grid.nearest(current, 1, visited, &city, &distance)
+                candidates = [city]
+        else:
+            row = problem.distance_matrix[current * n:(current + 1) * n]
+            candidates = heapq.nsmallest(wanted, unvisited, key=row.__getitem__)
+        city = candidates[random_below(&rng.rng, len(candidates)) if rng is not None else 0]
+        visited[city] = 1
+        remaining -= 1
+        if not problem.large_instance:
+            unvisited.remove(city)
+        if trip:
+            grown = joined_trips(problem, load, single_trip(problem, city))
+        if trip and not trip_fits(problem, grown):
+            # The drone can't take this one too: close the trip and start the next with it
+            route.extend(trip)
+            route.append(0)
+            trip = []
+        if trip:
+            load = grown
+        else:
+            load = single_trip(problem, city)
+        trip.append(city)
+        current = city
+    route.extend(trip)
+    return route
+
+def savings_route(DroneDeliveryProblem problem):
+    """Clarke-Wright savings: start with one trip per city and merge the pairs that save the most.
+
+    Pairs are (city, one of its neighbour_count nearest cities), ranked by
+    the distance saved; a merge is kept when the joined trip is feasible in
+    either direction and costs no more than the two trips it replaces.
+    """
+    cdef int n = problem.num_points, k, i, j, a, b
+    cdef int count = problem.neighbour_count
+    cdef list cities = list(range(1, n - 1))
+    cdef dict trips = {city: [city] for city in cities}
+    cdef list owner = list(range(n))
+    cdef list pairs = []
+    cdef bint flip_first, flip_second, use_reverse
+    cdef double cost
+    cdef TripSummary joined, reverse
+    # Summary of the trip each city is the owner of, indexed by city
+    cdef TripSummary* summaries = <TripSummary*>malloc(n * sizeof(TripSummary))
+    if summaries == NULL:
+        raise MemoryError()
+    try:
+        for i in cities:
+            summaries[i] = single_trip(problem, i)
+            neighbours = problem.neighbours[i * count:(i + 1) * count] if count > 0 else cities
+            for j in neighbours:
+                if j != i:
+                    pairs.append((pair_distance(problem, 0, j) + pair_distance(problem, 0, i)
+                                  - pair_distance(problem, i, j), i, j))
+        pairs.sort(reverse=True)
+
+        for _, i, j in pairs:
+            a = owner[i]
+            b = owner[j]
+            if a == b:
+                continue
+            # Only trip ends can be joined: orient the trips as first ... i, j ... second
+            flip_first = summaries[a].last != i
+            if flip_first and summaries[a].first != i:
+                continue
+            flip_second = summaries[b].first != j
+            if flip_second and summaries[b].last != j:
+                continue
+            joined = joined_trips(problem,
+                                  reversed_trip(problem, summaries[a]) if flip_first else summaries[a],
+                                  reversed_trip(problem, summaries[b]) if flip_second else summaries[b])
+            reverse = reversed_trip(problem, joined)
+            cost = summaries[a].usage + summaries[b].usage
+            if trip_fits(problem, joined) and not cheaper(cost, joined.usage):
+                use_reverse = trip_fits(problem, reverse) and cheaper(reverse.usage, joined.usage)
+            elif trip_fits(problem, reverse) and not cheaper(cost, reverse.usage):
+                use_reverse = True
             else:
-                i += 1
+                continue
+            first = trips[a][::-1] if flip_first else trips[a]
+            second = trips.pop(b)
+            if flip_second:
+                second = second[::-1]
+            trips[a] = (first + second)[::-1] if use_reverse else first + second
+            summaries[a] = reverse if use_reverse else joined
+            for city in second:
+                owner[city] = a
+    finally:
+        free(summaries)
+
+    cdef list route = []
+    for trip in trips.values():
+        route.extend(trip)
+        route.append(0)
+    return route[:-1]
+
+def repair_route(DroneDeliveryProblem problem, path):
+    """Fits a route from another version of the instance: unknown and repeated cities are dropped, missing ones get their own trip."""
+    cdef int n = problem.num_points, city
+    cdef bytearray seen = bytearray(n)
+    cdef list route = []
+    for city in path:
+        if city == 0:
+            route.append(0)
+        elif 0 < city < n - 1 and not seen[city]:
+            seen[city] = 1
+            route.append(city)
+    for city in range(1, n - 1):
+        if not seen[city]:
+            route.extend((0, city))
+    return route
+
+def load_seed_routes(*paths):
+    """best_path of every best_path_graph.json in paths that exists."""
+    routes = []
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                routes.append(json.load(f)['best_path'])
+    return routes
+
+def pack_population(list population):
+    """Routes, fitness values and validity of a population as four flat byte strings."""
+    cdef Individual individual
+    lengths = array.array('i', [len(individual.genes) for individual in population])
+    genes = array.array('i')
+    for individual in population:
+        genes.extend(individual.genes)
+    fitness = array.array('d', [individual.fitness for individual in population])
+    valid = bytes(individual.is_valid for individual in population)
+    return genes.tobytes(), lengths.tobytes(), fitness.tobytes(), valid
+
+def unpack_population(snapshot, DroneDeliveryProblem problem):
+    """Inverse of pack_population; the individuals are not evaluated again."""
+    genes, lengths, fitness, valid = snapshot
+    genes = array.array('i', genes)
+    lengths = array.array('i', lengths)
+    fitness = array.array('d', fitness)
+    population = []
+    offset = 0
+    for i, length in enumerate(lengths):
+        population.append(Individual.restore(genes[offset:offset + length], fitness[i], valid[i], problem))
+        offset += length
+    return population
 
 cdef class GeneticAlgorithm:
     cdef public DroneDeliveryProblem problem
@@ -142,79 +1649,189 @@ cdef class GeneticAlgorithm:
     cdef public int stagnation_counter
     cdef public double best_fitness
     cdef public list fitness_over_time
+    cdef public list population
+    cdef public int generation
+    cdef public object offspring_pool
+    cdef public object telemetry
+    cdef public int local_search_elites
+    cdef public int local_search_rounds
+    # Stopping rules checked after every generation, besides the generations count
+    cdef public double time_limit
+    cdef public double target_fitness
+    cdef public int max_stagnation
+    cdef public double min_diversity
+    cdef public double gap_tolerance
+    cdef public int exact_max_cities
+    cdef public object lower_bound  # None until optimality_bound works it out
+    cdef public int generations_without_improvement
+    cdef public object stop_reason
+    cdef public int stop_generation
+    cdef public object checkpoint_path
+    cdef public int checkpoint_interval
+    cdef public RandomStream rng
+    cdef public MutationController controller
+    cdef public dict seeding
+    cdef public list seed_routes
+    cdef public bint giant_tour
+    cdef public Profiler profiler
+    cdef double start_time
+    # Side file of generation_data and fitness_over_time, see save_checkpoint:
+    # its valid length and how many rows of each list it already holds
+    cdef object history_path
+    cdef long long history_offset
+    cdef int saved_generation_rows
+    cdef int saved_fitness_rows
 
-    def __init__(self, DroneDeliveryProblem problem, int population_size=2000, int generations=2000):
+    def __init__(self, DroneDeliveryProblem problem, int population_size=2000, int generations=2000, offspring_pool=None,
+                 telemetry=None, int local_search_elites=0, int local_search_rounds=10, double time_limit=0,
+                 double target_fitness=float('-inf'), int max_stagnation=0, double min_diversity=0,
+                 checkpoint_path=None, int checkpoint_interval=0, seed=None, MutationController controller=None,
+                 seeding=None, seed_routes=None, bint giant_tour=False, Profiler profiler=None,
+                 double gap_tolerance=0, int exact_max_cities=EXACT_MAX_CITIES):
         self.problem = problem
+        # Optional Profiler that times every stage of every generation
+        self.profiler = profiler
+        # Giant-tour mode: individuals are evolved as city orders and every new
+        # one gets its depot returns from problem.split instead of mutation
+        self.giant_tour = giant_tour
+        # Share of the initial population built by each of SEEDING_SOURCES, e.g.
+        # {'nearest_neighbour': 0.05, 'savings': 0.05, 'stored': 0.05}; the rest is
+        # random. 'stored' uses seed_routes, e.g. from load_seed_routes.
+        self.seeding = dict(seeding or {})
+        for source in self.seeding:
+            if source not in SEEDING_SOURCES:
+                raise ValueError(f'Unknown seeding source {source!r}, expected one of {SEEDING_SOURCES}')
+        self.seed_routes = list(seed_routes or [])
+        self.controller = controller if controller is not None else MutationController()
+        # Every random decision of the run comes from this stream; seed is an
+        # int, a RandomStream to use as is, or None for a random seed
+        self.rng = seed if isinstance(seed, RandomStream) else RandomStream(seed)
+        # Every checkpoint_interval generations the run state is saved to checkpoint_path (0 = never)
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        # time_limit: seconds of wall clock (0 = none); target_fitness: stop once the best reaches it;
+        # max_stagnation: generations without a new best (0 = none);
+        # min_diversity: stop when distinct fitness values / population size falls below it;
+        # gap_tolerance: stop once the best is within this fraction of optimality_bound (0 = proven optimal)
+        self.time_limit = time_limit
+        self.target_fitness = target_fitness
+        self.max_stagnation = max_stagnation
+        self.min_diversity = min_diversity
+        self.gap_tolerance = gap_tolerance
+        self.lower_bound = None
+        # Instances with up to this many cities (and EXACT_MAX_CITIES) start
+        # from their exact optimum, which then stops the run by the gap rule
+        self.exact_max_cities = exact_max_cities
+        self.generations_without_improvement = 0
+        self.stop_reason = None
+        self.stop_generation = -1
+        # Memetic stage: the local_search_elites best individuals get Individual.improve every generation
+        self.local_search_elites = local_search_elites
+        self.local_search_rounds = local_search_rounds
+        # Optional telemetry.TelemetrySink; generation_data and fitness_over_time stay empty when set
+        self.telemetry = telemetry
+        # Optional offspring_pool.OffspringPool that breeds children in other processes
+        self.offspring_pool = offspring_pool
         self.population_size = population_size
         self.generations = generations
         self.generation_data = []
         self.stagnation_counter = 0
         self.best_fitness = float('inf')
         self.fitness_over_time = []
+        self.population = None
+        self.generation = 0
+        self.history_path = None
+        self.history_offset = 0
+        self.saved_generation_rows = 0
+        self.saved_fitness_rows = 0
+
+    @property
+    def cache_hits(self):
+        return self.problem.cache_hits
+
+    @property
+    def cache_misses(self):
+        return self.problem.cache_misses
+
+    @property
+    def cache_hit_rate(self):
+        cdef long lookups = self.problem.cache_hits + self.problem.cache_misses
+        return self.problem.cache_hits / lookups if lookups > 0 else 0.0
 
     cpdef void adaptive_mutation_rate(self):
-        if self.stagnation_counter > 50:
-            self.problem.mutation_rate = 0.9
+        if self.controller.adapt(self.stagnation_counter):
             self.stagnation_counter = 0
-        elif self.problem.mutation_rate > 0.1:
-            self.problem.mutation_rate -= 0.01
 
     cpdef Individual create_individual(self):
-        cdef list path = list(range(1, len(self.problem.points) - 1))
-        random.shuffle(path)
-        return Individual(path, self.problem)
+        cdef list path
+        if self.problem.large_instance:
+            # A random order of thousands of cities is too far from anything
+            # good to evolve from; start from randomized greedy routes instead
+            return self._new_individual(nearest_neighbour_route(self.problem, self.rng))
+        path = list(range(1, len(self.problem.points) - 1))
+        self.rng.shuffle(path)
+        return self._new_individual(path)
 
+    cdef Individual _new_individual(self, path, array.array trip_costs=None, array.array trip_valid=None):
+        # Mutated with the run's current rate; its validity feeds back into the rate
+        cdef Individual individual = Individual(path, self.problem, self.rng, self.controller.mutation_rate,
+                                                self.giant_tour, trip_costs, trip_valid)
+        self.controller.register_fitness(individual.is_valid)
+        return individual
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
     cpdef Individual partially_matched_crossover(self, Individual parent1, Individual parent2):
-        cdef list parent1_path = parent1.path.copy()
-        cdef list parent2_path = parent2.path.copy()
-        cdef list parent1_subroutes = []
-        cdef list parent2_subroutes = []
-        cdef list route = []
-        cdef int i
-        cdef list already_added_cities = []
-        cdef list child_route = []
+        cdef int length1 = len(parent1.genes), length2 = len(parent2.genes)
+        cdef array.array bounds = array.clone(int_template, 3 * (length1 + length2 + 2), zero=False)
+        cdef int* starts1 = bounds.data.as_ints
+        cdef int* ends1 = starts1 + length1 + 1
+        cdef int* ids1 = ends1 + length1 + 1
+        cdef int* starts2 = ids1 + length1 + 1
+        cdef int* ends2 = starts2 + length2 + 1
+        cdef int* ids2 = ends2 + length2 + 1
+        cdef int count1 = split_subroutes(parent1.genes, starts1, ends1, ids1)
+        cdef int count2 = split_subroutes(parent2.genes, starts2, ends2, ids2)
+        # Bitmap of cities already placed in the child, indexed by city id
+        cdef array.array added = array.clone(byte_template, self.problem.num_points, zero=True)
+        cdef signed char* already_added = added.data.as_schars
+        cdef array.array child = array.clone(int_template, length1 + length2 + 2, zero=False)
+        cdef int* child_genes = child.data.as_ints
+        cdef int child_length = 0, k, trip, size, trips = 0
+        # Costs of the child's trips that come whole from a parent, so the
+        # child only evaluates the trips that lost cities
+        cdef array.array trip_costs = array.clone(double_template, count1 + count2, zero=False)
+        cdef array.array trip_valid = array.clone(byte_template, count1 + count2, zero=False)
+        cdef RandomState* state = &self.rng.rng
+        cdef long long start_time = now_ns() if self.profiler is not None else 0
 
-        for i in parent1_path:
-            if i == 0:
-                parent1_subroutes.append(route)
-                route = []
-            else:
-                route.append(i)
-        if len(route) > 0:
-            parent1_subroutes.append(route)
-        route = []
-        for i in parent2_path:
-            if i == 0:
-                parent2_subroutes.append(route)
-                route = []
-            else:
-                route.append(i)
-        if len(route) > 0:
-            parent2_subroutes.append(route)
-
-        while len(parent1_subroutes) > 0 and len(parent2_subroutes) > 0:
-            if len(parent1_subroutes) > 0:
-                subroute_1 = parent1_subroutes.pop(random.randint(0,len(parent1_subroutes)-1))
-                for i in subroute_1:
-                    if i not in already_added_cities:
-                        already_added_cities.append(i)
-                        child_route.append(i)
-                child_route.append(0)
-            if len(parent2_subroutes) > 0:
-                subroute_2 = parent2_subroutes.pop(random.randint(0,len(parent2_subroutes)-1))
-                for i in subroute_2:
-                    if i not in already_added_cities:
-                        already_added_cities.append(i)
-                        child_route.append(i)
-                child_route.append(0)
-        return Individual(child_route, self.problem)
-
-    cdef tuple tournament_selection(self, list population, int tournament_size=3):
-        cdef list tournament1 = random.sample(population, tournament_size)
-        cdef Individual min_individual1 = self._find_min_individual(tournament1)
-        cdef list tournament2 = random.sample(population, tournament_size)
-        cdef Individual min_individual2 = self._find_min_individual(tournament2)
-        return min_individual1, min_individual2
+        while count1 > 0 and count2 > 0:
+            k = random_below(state, count1)
+            trip = ids1[k]
+            size = ends1[k] - starts1[k]
+            k = take_subroute(parent1.genes.data.as_ints, starts1, ends1, ids1, count1, k,
+                              already_added, child_genes, child_length)
+            trips = inherit_trip(parent1, trip, size, k - child_length,
+                                 trip_costs.data.as_doubles, trip_valid.data.as_schars, trips)
+            child_length = k
+            count1 -= 1
+            k = random_below(state, count2)
+            trip = ids2[k]
+            size = ends2[k] - starts2[k]
+            k = take_subroute(parent2.genes.data.as_ints, starts2, ends2, ids2, count2, k,
+                              already_added, child_genes, child_length)
+            trips = inherit_trip(parent2, trip, size, k - child_length,
+                                 trip_costs.data.as_doubles, trip_valid.data.as_schars, trips)
+            child_length = k
+            count2 -= 1
+
+        # Without the last trip's 0 the child is already normalized
+        array.resize(child, child_length - 1 if child_length > 0 else 0)
+        array.resize(trip_costs, trips)
+        array.resize(trip_valid, trips)
+        if self.profiler is not None:
+            self.profiler.add(STAGE_CROSSOVER, start_time)
+        return self._new_individual(child, trip_costs, trip_valid)
 
     cdef Individual _find_min_individual(self, list tournament):
         cdef Individual min_individual = tournament[0]
@@ -224,53 +1841,388 @@ cdef class GeneticAlgorithm:
                 min_individual = individual
         return min_individual
 
-    cpdef tuple run(self):
-        cdef list population = [self.create_individual() for _ in range(self.population_size)]
-        cdef int generation
+    cpdef list seeded_individuals(self):
+        """The warm-start part of the initial population, as configured by seeding."""
+        cdef list individuals = []
+        cdef list routes
+        cdef Individual individual
+        cdef int k, count
+        for source in SEEDING_SOURCES:
+            count = min(int(round(self.seeding.get(source, 0) * self.population_size)),
+                        self.population_size - len(individuals))
+            if count <= 0:
+                continue
+            if source == 'nearest_neighbour':
+                routes = [nearest_neighbour_route(self.problem)]
+                for k in range(count - 1):
+                    routes.append(nearest_neighbour_route(self.problem, self.rng))
+            elif source == 'savings':
+                routes = [savings_route(self.problem)]
+            else:
+                routes = [repair_route(self.problem, route) for route in self.seed_routes]
+            if not routes:
+                continue
+            if self.giant_tour:
+                routes = [self.problem.split(route) for route in routes]
+            # Every route goes in once as is; the rest of the share are mutated copies
+            for k in range(count):
+                if k >= len(routes) and self.giant_tour:
+                    # The same move as for any giant-tour individual: a swap, then split
+                    individual = Individual(array.copy(as_genes(routes[k % len(routes)])), self.problem,
+                                            self.rng, 1.0, True)
+                else:
+                    individual = Individual.from_genes(routes[k % len(routes)], self.problem)
+                    if k >= len(routes):
+                        individual.mutate(self.rng)
+                self.controller.register_fitness(individual.is_valid)
+                individuals.append(individual)
+        return individuals
+
+    cpdef Individual exact_individual(self):
+        """The exact optimum of a small enough instance (see exact_max_cities), otherwise None."""
+        if self.problem.num_points - 2 > min(self.exact_max_cities, EXACT_MAX_CITIES):
+            return None
+        return Individual.from_genes(self.problem.exact_solution()[0], self.problem)
+
+    cpdef double optimality_bound(self):
+        """Fitness no valid route can beat: the exact optimum where it is known, else problem.lower_bound()."""
+        cdef Individual exact
+        if self.lower_bound is None:
+            exact = self.exact_individual()
+            self.lower_bound = exact.fitness if exact is not None and exact.is_valid else self.problem.lower_bound()
+        return self.lower_bound
+
+    cpdef void initialize(self):
+        global active_profiler
+        cdef Profiler previous = active_profiler
+        cdef Individual exact
+        active_profiler = self.profiler
+        try:
+            self.population = []
+            exact = self.exact_individual()
+            if exact is not None:
+                self.controller.register_fitness(exact.is_valid)
+                self.population.append(exact)
+            self.population.extend(self.seeded_individuals())
+            del self.population[self.population_size:]
+            while len(self.population) < self.population_size:
+                self.population.append(self.create_individual())
+        finally:
+            active_profiler = previous
+        self.generation = 0
+        self.start_time = time.time()
+
+    cpdef void step(self):
+        global active_profiler
+        cdef Profiler previous = active_profiler
+        cdef int generation = self.generation
+        active_profiler = self.profiler
+        try:
+            self._step()
+        finally:
+            active_profiler = previous
+        if self.profiler is not None:
+            self.profiler.end_generation(generation, self.population)
+
+    cdef void _step(self):
+        cdef list population = self.population
         cdef double current_best_fitness
         cdef int elitism_number
         cdef list new_population
-        cdef Individual parent1, parent2, child, best_solution
-        cdef double start_time = time.time()
+        cdef list ranked
+        cdef Individual child
+        cdef long long start = now_ns() if self.profiler is not None else 0
+
+        elitism_number = int(self.population_size * 0.05)
+        elitism_number += elitism_number % 2
+        # Only the elite needs ordering; nsmallest gives the same individuals
+        # in the same order as sorting the whole population would
+        ranked = heapq.nsmallest(max(elitism_number, self.local_search_elites, 1), population, key=self._get_fitness)
+        if self.profiler is not None:
+            self.profiler.add(STAGE_SELECTION, start)
+        if self.local_search_elites > 0:
+            start = now_ns() if self.profiler is not None else 0
+            for child in ranked[:self.local_search_elites]:
+                child.improve(self.local_search_rounds)
+                self.controller.register_fitness(child.is_valid)
+            ranked.sort(key=self._get_fitness)
+            if self.profiler is not None:
+                self.profiler.add(STAGE_LOCAL_SEARCH, start)
 
-        for generation in range(self.generations):
-            population.sort(key=self._get_fitness)
+        # Save generation data to build graph
+        start = now_ns() if self.profiler is not None else 0
+        valid_count, best, worst, mean = population_stats(population)
+        elapsed_time = time.time() - self.start_time
+        if self.telemetry is not None:
+            self.telemetry.append(self.generation, valid_count, best, worst, mean, elapsed_time)
+        else:
+            self.generation_data.append({
+                'generation': self.generation,
+                'best_fitness': best,
+                'worst_fitness': worst,
+                'mean_fitness': mean,
+            })
+            if valid_count > 0:
+                self.fitness_over_time.append((best, elapsed_time))
+        if self.profiler is not None:
+            self.profiler.add(STAGE_TELEMETRY, start)
 
-            # Save generation data to build graph
-            generation_data = build_generation_data(population, generation)
-            self.generation_data.append(generation_data)
+        current_best_fitness = ranked[0].fitness
 
-            current_best_fitness = population[0].fitness
-            
-            elapsed_time = time.time() - start_time
-            if generation_data['best_fitness'] != -1:
-                self.fitness_over_time.append((generation_data['best_fitness'], elapsed_time))
+        if current_best_fitness < self.best_fitness:
+            self.best_fitness = current_best_fitness
+            self.stagnation_counter = 0
+            self.generations_without_improvement = 0
+        else:
+            self.stagnation_counter += 1
+            self.generations_without_improvement += 1
 
-            if current_best_fitness < self.best_fitness:
-                self.best_fitness = current_best_fitness
-                self.stagnation_counter = 0
-            else:
-                self.stagnation_counter += 1
+        self.adaptive_mutation_rate()
 
-            self.adaptive_mutation_rate()
+        #if generation % 2 == 0:
+        #    print(f"Generation {generation}: Best fitness = {self.best_fitness}")
+        #    print(f'Best solution: {ranked[0].path}')
 
-            #if generation % 2 == 0:
-            #    print(f"Generation {generation}: Best fitness = {self.best_fitness}")
-            #    print(f'Best solution: {population[0].path}')
+        new_population = ranked[:elitism_number]
 
-            elitism_number = int(self.population_size * 0.05)
-            elitism_number += elitism_number % 2
-            new_population = population[:elitism_number]
+        if self.offspring_pool is not None:
+            children = self.offspring_pool.breed(self, population, self.population_size - elitism_number)
+            for child in children:
+                self.controller.register_fitness(child.is_valid)
+            new_population.extend(children)
+        else:
+            new_population.extend(self.breed(population, self.population_size - elitism_number))
 
-            while len(new_population) < self.population_size:
-                parent1, parent2 = self.tournament_selection(population)
-                child = self.partially_matched_crossover(parent1, parent2)
-                new_population.append(child)
+        self.population = new_population
+        self.generation += 1
 
-            population = new_population
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cpdef list breed(self, list population, int count, int tournament_size=3):
+        """Produces count children from population by tournament selection and crossover.
 
-        best_solution = self._find_min_individual(population)
+        All tournaments of the call are drawn up front in one batch and
+        decided on a flat fitness array.
+        """
+        cdef int n = len(population), i, k, winner1, winner2
+        cdef list children = []
+        cdef Individual individual
+        cdef long long start = now_ns() if self.profiler is not None else 0
+        cdef array.array fitness = array.clone(double_template, n, zero=False)
+        cdef double* fitness_data = fitness.data.as_doubles
+        tournament_size = min(tournament_size, n)
+        cdef array.array draws = draw_tournaments(self.rng, n, 2 * count, tournament_size)
+        cdef unsigned int* entrants = draws.data.as_uints
+
+        for i in range(n):
+            individual = population[i]
+            fitness_data[i] = individual.fitness
+        if self.profiler is not None:
+            self.profiler.add(STAGE_TOURNAMENT, start)
+        for k in range(count):
+            start = now_ns() if self.profiler is not None else 0
+            winner1 = tournament_winner(fitness_data, entrants + 2 * k * tournament_size, tournament_size)
+            winner2 = tournament_winner(fitness_data, entrants + (2 * k + 1) * tournament_size, tournament_size)
+            if self.profiler is not None:
+                self.profiler.add(STAGE_TOURNAMENT, start)
+            children.append(self.partially_matched_crossover(population[winner1], population[winner2]))
+        return children
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cpdef list breed_packed(self, const int[::1] genes, const int[::1] offsets, const double[::1] fitness,
+                            const unsigned char[::1] valid, int count, int tournament_size=3):
+        """breed() on a population laid out in flat buffers instead of Individuals.
+
+        Route i is genes[offsets[i]:offsets[i + 1]] with fitness[i] and
+        valid[i]. Tournaments are decided on the fitness buffer directly and
+        only their winners are built as Individuals, each once per call.
+        """
+        cdef int n = fitness.shape[0], k, winner1, winner2
+        cdef list children = []
+        cdef dict parents = {}
+        cdef long long start = now_ns() if self.profiler is not None else 0
+        tournament_size = min(tournament_size, n)
+        cdef array.array draws = draw_tournaments(self.rng, n, 2 * count, tournament_size)
+        cdef unsigned int* entrants = draws.data.as_uints
+
+        if self.profiler is not None:
+            self.profiler.add(STAGE_TOURNAMENT, start)
+        for k in range(count):
+            start = now_ns() if self.profiler is not None else 0
+            winner1 = tournament_winner(&fitness[0], entrants + 2 * k * tournament_size, tournament_size)
+            winner2 = tournament_winner(&fitness[0], entrants + (2 * k + 1) * tournament_size, tournament_size)
+            if self.profiler is not None:
+                self.profiler.add(STAGE_TOURNAMENT, start)
+            children.append(self.partially_matched_crossover(
+                self._packed_parent(parents, winner1, genes, offsets, fitness, valid),
+                self._packed_parent(parents, winner2, genes, offsets, fitness, valid)))
+        return children
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef Individual _packed_parent(self, dict parents, int i, const int[::1] genes, const int[::1] offsets,
+                                   const double[::1] fitness, const unsigned char[::1] valid):
+        # Individual i of a breed_packed population, built the first time it wins
+        cdef Individual parent = parents.get(i)
+        cdef int length = offsets[i + 1] - offsets[i]
+        cdef array.array route
+        if parent is not None:
+            return parent
+        route = array.clone(int_template, length, zero=False)
+        if length > 0:
+            memcpy(route.data.as_ints, &genes[offsets[i]], length * sizeof(int))
+        parent = Individual.restore(route, fitness[i], valid[i], self.problem)
+        if not self.giant_tour:
+            # Trip summaries for its children to inherit
+            parent._find_trips()
+            parent._evaluate_trips()
+        parents[i] = parent
+        return parent
+
+    cpdef tuple best(self):
+        cdef Individual best_solution = self._find_min_individual(self.population)
         return best_solution.path, best_solution.fitness
 
+    cpdef object check_stop(self):
+        """Name of the first stopping rule that is met, or None to keep going."""
+        cdef Individual individual
+        if self.generation >= self.generations:
+            return 'generations'
+        if self.best_fitness <= self.target_fitness:
+            return 'target_fitness'
+        if (self.best_fitness < INFINITY
+                and self.best_fitness - self.optimality_bound() <= self.gap_tolerance * abs(self.best_fitness)):
+            return 'gap'
+        if self.max_stagnation > 0 and self.generations_without_improvement >= self.max_stagnation:
+            return 'no_improvement'
+        if self.time_limit > 0 and time.time() - self.start_time >= self.time_limit:
+            return 'time_limit'
+        if self.min_diversity > 0 and self.generation > 0:
+            if len({individual.fitness for individual in self.population}) < self.min_diversity * len(self.population):
+                return 'diversity'
+        return None
+
+    cpdef tuple run(self):
+        self.initialize()
+        return self._evolve()
+
+    cpdef tuple resume(self, path):
+        """Continues a run from a checkpoint written by save_checkpoint."""
+        self.load_checkpoint(path)
+        return self._evolve()
+
+    cdef tuple _evolve(self):
+        while True:
+            self.stop_reason = self.check_stop()
+            if self.stop_reason is not None:
+                break
+            self.step()
+            if self.checkpoint_interval > 0 and self.generation % self.checkpoint_interval == 0:
+                self.save_checkpoint(self.checkpoint_path)
+        self.stop_generation = self.generation
+        return self.best()
+
+    def save_checkpoint(self, path):
+        """Atomically writes everything needed to continue this run exactly.
+
+        generation_data and fitness_over_time go to path + '.history', to
+        which each checkpoint appends only the rows added since the one
+        before, so checkpoints keep the same size however long the run.
+        """
+        if self.telemetry is not None:
+            self.telemetry.flush()
+        self._save_history(f'{path}.history')
+        state = {
+            'version': CHECKPOINT_VERSION,
+            'population': pack_population(self.population),
+            'generation': self.generation,
+            'best_fitness': self.best_fitness,
+            'stagnation_counter': self.stagnation_counter,
+            'generations_without_improvement': self.generations_without_improvement,
+            'mutation_rate': self.controller.mutation_rate,
+            'viable_solution': self.controller.viable_solution,
+            'random_state': self.rng.getstate(),
+            'elapsed_time': time.time() - self.start_time,
+            'history_offset': self.history_offset,
+            'telemetry_rows': self.telemetry.rows if self.telemetry is not None else None,
+        }
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'wb') as f:
+            f.write(CHECKPOINT_MAGIC)
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, path)
+
+    cdef void _save_history(self, history_path):
+        if history_path != self.history_path:
+            # First checkpoint to this path in this run: the file starts over
+            self.history_path = history_path
+            self.history_offset = 0
+            self.saved_generation_rows = 0
+            self.saved_fitness_rows = 0
+        if (len(self.generation_data) == self.saved_generation_rows
+                and len(self.fitness_over_time) == self.saved_fitness_rows):
+            return
+        with open(history_path, 'r+b' if self.history_offset > 0 else 'wb') as f:
+            # Whatever lies past the last checkpoint's offset is from a save that did not finish
+            f.truncate(self.history_offset)
+            f.seek(self.history_offset)
+            pickle.dump((self.generation_data[self.saved_generation_rows:],
+                         self.fitness_over_time[self.saved_fitness_rows:]), f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+            self.history_offset = f.tell()
+        self.saved_generation_rows = len(self.generation_data)
+        self.saved_fitness_rows = len(self.fitness_over_time)
+
+    def load_checkpoint(self, path):
+        with open(path, 'rb') as f:
+            if f.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+                raise ValueError(f'{path} is not a checkpoint file')
+            state = pickle.load(f)
+        if state['version'] != CHECKPOINT_VERSION:
+            raise ValueError(f'{path} has checkpoint version {state["version"]}, expected {CHECKPOINT_VERSION}')
+        self.population = unpack_population(state['population'], self.problem)
+        self.generation = state['generation']
+        self.best_fitness = state['best_fitness']
+        self.stagnation_counter = state['stagnation_counter']
+        self.generations_without_improvement = state['generations_without_improvement']
+        self.controller.mutation_rate = state['mutation_rate']
+        self.controller.viable_solution = state['viable_solution']
+        self.rng.setstate(state['random_state'])
+        self.start_time = time.time() - state['elapsed_time']
+        self.generation_data = []
+        self.fitness_over_time = []
+        if state['history_offset'] > 0:
+            with open(f'{path}.history', 'rb') as f:
+                while f.tell() < state['history_offset']:
+                    generation_data, fitness_over_time = pickle.load(f)
+                    self.generation_data.extend(generation_data)
+                    self.fitness_over_time.extend(fitness_over_time)
+        self.history_path = f'{path}.history'
+        self.history_offset = state['history_offset']
+        self.saved_generation_rows = len(self.generation_data)
+        self.saved_fitness_rows = len(self.fitness_over_time)
+        if self.telemetry is not None and state['telemetry_rows'] is not None:
+            self.telemetry.truncate(state['telemetry_rows'])
+        self.stop_reason = None
+        self.stop_generation = -1
+
+    cpdef list emigrants(self, int count):
+        """Copies of the routes of the count best individuals, best first."""
+        cdef Individual individual
+        return [array.copy(individual.genes) for individual in heapq.nsmallest(count, self.population, key=self._get_fitness)]
+
+    cpdef void immigrate(self, list routes):
+        """Replaces the worst individuals with the given routes, unmutated."""
+        cdef Individual individual
+        cdef list fitness = [individual.fitness for individual in self.population]
+        cdef list worst = heapq.nlargest(len(routes), range(len(fitness)), key=fitness.__getitem__)
+        for i, route in zip(worst, routes):
+            self.population[i] = Individual.from_genes(route, self.problem)
+            self.controller.register_fitness(self.population[i].is_valid)
+
     cdef double _get_fitness(self, Individual individual):
         return individual.fitness
\ No newline at end of file
@@ -0,0 +1,169 @@
+import json
+import os
+import sys
+import array
+import multiprocessing as mp
+import queue
+import traceback
+from drone_delivery_cython import DroneDeliveryProblem, GeneticAlgorithm, RandomStream
+
+# Island model: each island is a GeneticAlgorithm with its own population
+# running in its own process. Every migration_interval generations each
+# island sends copies of its best routes to its neighbours, which replace
+# their worst individuals with them.
+
+TOPOLOGIES = ('ring', 'full')
+
+def neighbours(island, islands, topology):
+    """Islands that receive migrants from the given island."""
+    if topology == 'ring':
+        return [(island + 1) % islands] if islands > 1 else []
+    if topology == 'full':
+        return [other for other in range(islands) if other != island]
+    raise ValueError(f'Unknown topology {topology!r}, expected one of {TOPOLOGIES}')
+
+def exchange(ga, island, generation, stop_reason, settings, inboxes, early):
+    """One migration round; returns the stop reason of the first island that voted to stop, or None.
+
+    Every island hears from every other one each round, so that a stop vote
+    reaches all of them whatever the topology; only neighbours get migrants.
+    Messages are tagged with their generation: with several sources an
+    island can already be sent the next round's migrants while it still
+    waits for this round's, and those are kept in early until then.
+    """
+    islands = len(inboxes)
+    targets = neighbours(island, islands, settings['topology'])
+    # Routes travel as raw int32 bytes to keep the pickles small
+    migrants = [genes.tobytes() for genes in ga.emigrants(settings['migrants'])]
+    for other in range(islands):
+        if other != island:
+            inboxes[other].put((generation, island, migrants if other in targets else None, stop_reason))
+    received = early.pop(generation, [])
+    while len(received) < islands - 1:
+        message = inboxes[island].get()
+        if message[0] == generation:
+            received.append(message)
+        else:
+            early.setdefault(message[0], []).append(message)
+    # Same order on every run, so migration is reproducible
+    received.sort(key=lambda message: message[1])
+    ga.immigrate([array.array('i', route) for _, _, routes, _ in received if routes is not None for route in routes])
+    votes = [(island, stop_reason)] + [(other, reason) for _, other, _, reason in received]
+    return next((f'island {other}: {reason}' for other, reason in sorted(votes) if reason is not None), None)
+
+def evolve_island(island, problem_data, settings, inboxes):
+    problem = DroneDeliveryProblem(problem_data)
+    # Same seed on every island, each on its own PCG stream
+    ga = GeneticAlgorithm(problem, population_size=settings['population_size'], generations=settings['generations'],
+                          seed=RandomStream(settings['seed'], island), **settings['options'])
+    interval = settings['migration_interval']
+    early = {}
+
+    ga.initialize()
+    while True:
+        stop_reason = ga.check_stop()
+        if stop_reason is None:
+            ga.step()
+            if ga.generation % interval != 0 or ga.generation >= ga.generations:
+                continue
+            generation = ga.generation
+        else:
+            # The others will wait for this island at the next round, if
+            # there is one; it tells them to stop there too
+            generation = (ga.generation // interval + 1) * interval
+            if generation >= ga.generations:
+                break
+        stop_reason = exchange(ga, island, generation, stop_reason, settings, inboxes, early)
+        if stop_reason is not None:
+            break
+    ga.stop_reason = stop_reason
+    ga.stop_generation = ga.generation
+
+    best_path, best_fitness = ga.best()
+    return best_path, best_fitness, ga.generation_data, ga.fitness_over_time, ga.stop_reason
+
+def island_worker(island, problem_data, settings, inboxes, results):
+    try:
+        results.put((island, None, evolve_island(island, problem_data, settings, inboxes)))
+    except Exception:
+        # Reported instead of raised, so run_islands doesn't wait for a result forever
+        results.put((island, traceback.format_exc(), None))
+
+def collect_results(workers, results):
+    """Each island's result by island number; raises as soon as one fails or dies."""
+    island_results = {}
+    missing = set()
+    while len(island_results) < len(workers):
+        try:
+            island, error, result = results.get(timeout=1.0)
+        except queue.Empty:
+            # A worker that exits normally has put its result first, so a
+            # dead one still missing one timeout later is never sending it
+            for island in missing:
+                if island not in island_results:
+                    raise RuntimeError(f'island {island} exited with code {workers[island].exitcode} '
+                                       f'without a result')
+            missing = {island for island, worker in enumerate(workers)
+                       if island not in island_results and worker.exitcode is not None}
+            continue
+        if error is not None:
+            raise RuntimeError(f'island {island} failed:\n{error}')
+        island_results[island] = result
+    return [island_results[island] for island in range(len(workers))]
+
+def run_islands(problem_data, islands=None, population_size=1000, generations=1000,
+                migration_interval=50, migrants=5, topology='ring', seed=0, **options):
+    """Runs an island-model GA on one instance using one process per island.
+
+    Other keyword arguments (time_limit, target_fitness, gap_tolerance,
+    max_stagnation, ...) are passed to every island's GeneticAlgorithm;
+    once a stopping rule fires on any island, all islands stop at the next
+    migration. Raises RuntimeError if an island fails.
+
+    Returns the best path and fitness over all islands, plus each island's
+    (best_path, best_fitness, generation_data, fitness_over_time, stop_reason)
+    ordered by island number.
+    """
+    if islands is None:
+        islands = os.cpu_count() or 1
+    neighbours(0, islands, topology)  # fail early on a bad topology
+    settings = {
+        'population_size': population_size,
+        'generations': generations,
+        'migration_interval': migration_interval,
+        'migrants': migrants,
+        'topology': topology,
+        'seed': seed,
+        'options': options,
+    }
+
+    inboxes = [mp.Queue() for _ in range(islands)]
+    results = mp.Queue()
+    workers = [mp.Process(target=island_worker, args=(island, problem_data, settings, inboxes, results))
+               for island in range(islands)]
+    for worker in workers:
+        worker.start()
+    try:
+        island_results = collect_results(workers, results)
+    except BaseException:
+        # The other islands may be waiting for the failed one's migrants
+        for worker in workers:
+            worker.terminate()
+        raise
+    finally:
+        for worker in workers:
+            worker.join()
+
+    best_path, best_fitness = min(((result[0], result[1]) for result in island_results), key=lambda result: result[1])
+    return best_path, best_fitness, island_results
+
+if __name__ == "__main__":
+    file_name = sys.argv[1] if len(sys.argv) > 1 else 'drone_problem_3.json'
+    with open(f'tests/{file_name}', 'r') as f:
+        problemData = json.load(f)
+
+    best_path, best_fitness, island_results = run_islands(problemData)
+    for island, (_, fitness, _, _, _) in enumerate(island_results):
+        print(f"Island {island} - Best fitness: {fitness}")
+    print(f"{file_name} - Best path: {best_path}")
+    print(f"{file_name} - Best fitness: {best_fitness}")
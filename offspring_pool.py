@@ -0,0 +1,125 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from drone_delivery_cython import DroneDeliveryProblem, GeneticAlgorithm, pack_population, unpack_population
+
+# Splits the children of one generation across worker processes. Once per
+# generation the current population is written to a shared memory block
+# (fitness values, route offsets, all routes in one int32 buffer, validity
+# flags); the workers only get its name and sizes. Each worker runs its
+# tournaments on the shared fitness values, builds just the parents they
+# pick, breeds its share of the new population with a RandomStream spawned
+# from the GA's own, and sends the children back packed. For a given seed
+# and worker count the run is reproducible.
+
+worker_ga = None
+worker_block = None
+
+def population_views(buffer, size, gene_count):
+    """(genes, offsets, fitness, valid) views of a population of size routes laid out in buffer."""
+    view = memoryview(buffer)
+    fitness_end = 8 * size
+    offsets_end = fitness_end + 4 * (size + 1)
+    genes_end = offsets_end + 4 * gene_count
+    return (view[offsets_end:genes_end].cast('i'), view[fitness_end:offsets_end].cast('i'),
+            view[:fitness_end].cast('d'), view[genes_end:genes_end + size])
+
+def population_nbytes(size, gene_count):
+    return 8 * size + 4 * (size + 1) + 4 * gene_count + size
+
+def init_worker(problem_data, problem_options):
+    global worker_ga
+    # The problem is built once per worker and reused every generation, with
+    # the parent's options so that large instances skip the O(n²) setup and
+    # the children are bred exactly as the serial path would
+    worker_ga = GeneticAlgorithm(DroneDeliveryProblem(problem_data, **problem_options))
+
+def attach_block(name):
+    global worker_block
+    if worker_block is None or worker_block.name != name:
+        if worker_block is not None:
+            worker_block.close()
+        worker_block = shared_memory.SharedMemory(name)
+    return worker_block
+
+def breed_slice(name, size, gene_count, count, mutation_rate, viable_solution, giant_tour, rng):
+    worker_ga.rng = rng
+    worker_ga.giant_tour = giant_tour
+    worker_ga.controller.mutation_rate = mutation_rate
+    worker_ga.controller.viable_solution = viable_solution
+    genes, offsets, fitness, valid = population_views(attach_block(name).buf, size, gene_count)
+    try:
+        return pack_population(worker_ga.breed_packed(genes, offsets, fitness, valid, count))
+    finally:
+        # Views must go before the block can be closed or replaced
+        genes.release()
+        offsets.release()
+        fitness.release()
+        valid.release()
+
+class OffspringPool:
+    def __init__(self, problem_data, workers=None, **problem_options):
+        """problem_options are the DroneDeliveryProblem arguments (large_instance,
+        neighbour_count, fitness_cache_size) the GA's problem was built with.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        # Workers forked before the first block would each start their own
+        # resource tracker, which unlinks the blocks they attached to on exit
+        resource_tracker.ensure_running()
+        self.executor = ProcessPoolExecutor(self.workers, initializer=init_worker,
+                                            initargs=(problem_data, problem_options))
+        self.block = None
+
+    def publish(self, population):
+        """Writes population to the shared block, growing it when needed; returns the gene count."""
+        gene_count = sum(len(individual.genes) for individual in population)
+        nbytes = population_nbytes(len(population), gene_count)
+        if self.block is None or self.block.size < nbytes:
+            self.release()
+            # Some slack so that routes growing by a few depot returns don't
+            # need a new block every generation
+            self.block = shared_memory.SharedMemory(create=True, size=nbytes + nbytes // 4)
+        genes, offsets, fitness, valid = population_views(self.block.buf, len(population), gene_count)
+        offset = 0
+        for i, individual in enumerate(population):
+            offsets[i] = offset
+            genes[offset:offset + len(individual.genes)] = individual.genes
+            offset += len(individual.genes)
+            fitness[i] = individual.fitness
+            valid[i] = individual.is_valid
+        offsets[len(population)] = offset
+        for view in (genes, offsets, fitness, valid):
+            view.release()
+        return gene_count
+
+    def breed(self, ga, population, count):
+        """Breeds count children of population across the workers."""
+        gene_count = self.publish(population)
+        sizes = [count // self.workers + (1 if k < count % self.workers else 0) for k in range(self.workers)]
+        streams = ga.rng.spawn(self.workers)
+        futures = [
+            self.executor.submit(breed_slice, self.block.name, len(population), gene_count, size,
+                                 ga.controller.mutation_rate, ga.controller.viable_solution, ga.giant_tour,
+                                 streams[k])
+            for k, size in enumerate(sizes) if size > 0
+        ]
+        children = []
+        for future in futures:
+            children.extend(unpack_population(future.result(), ga.problem))
+        return children
+
+    def release(self):
+        if self.block is not None:
+            self.block.close()
+            self.block.unlink()
+            self.block = None
+
+    def close(self):
+        self.executor.shutdown()
+        self.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,126 @@
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+matplotlib.use('Agg')
+from telemetry import FILE_NAME as TELEMETRY_FILE
+from visualizar_melhor_caminho import plot_best_path
+from visualizar_geracoes import plot_fitness_over_generations
+from visualizar_fitness_over_time import plot_fitness_over_time
+
+# Draws the plots of every results/<name>/ folder into graphics/<name>/,
+# in this process or on a worker pool, and only redraws a plot when one of
+# its input files changed since it was last drawn. What each plot was drawn
+# from (mtime, size and SHA-1 of every input) is kept in
+# graphics/<name>/render_manifest.json; a file whose mtime changed but whose
+# content did not is not a reason to redraw.
+#
+#   python render.py               # everything that changed
+#   python render.py 3 50 --force  # these two, unconditionally
+
+MANIFEST_NAME = 'render_manifest.json'
+
+def best_path_inputs(folder):
+    return [os.path.join(folder, 'best_path_graph.json')]
+
+def generation_inputs(folder):
+    telemetry_path = os.path.join(folder, TELEMETRY_FILE)
+    return [telemetry_path if os.path.exists(telemetry_path) else os.path.join(folder, 'generation_data.json')]
+
+def fitness_over_time_inputs(folder):
+    telemetry_path = os.path.join(folder, TELEMETRY_FILE)
+    inputs = [telemetry_path if os.path.exists(telemetry_path) else os.path.join(folder, 'fitness_over_time.json')]
+    simplex_path = os.path.join(folder, 'simplex.json')
+    if os.path.exists(simplex_path):
+        inputs.append(simplex_path)
+    return inputs
+
+# plot name -> (function, input files of a results folder, output file)
+PLOTS = {
+    'best_path': (plot_best_path, best_path_inputs, 'best_path.png'),
+    'fitness_over_generations': (plot_fitness_over_generations, generation_inputs, 'fitness_over_generations.png'),
+    'fitness_over_time': (plot_fitness_over_time, fitness_over_time_inputs, 'fitness_over_time.png'),
+}
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def is_current(inputs, stored):
+    """Whether the inputs are the ones a plot was drawn from; refreshes stored mtimes when only they moved."""
+    if stored is None or sorted(stored) != sorted(inputs):
+        return False
+    for path in inputs:
+        stat = os.stat(path)
+        mtime, size, digest = stored[path]
+        if stat.st_size != size:
+            return False
+        if stat.st_mtime_ns != mtime:
+            if file_digest(path) != digest:
+                return False
+            stored[path] = [stat.st_mtime_ns, size, digest]
+    return True
+
+def render_result(name, results_dir='results', graphics_dir='graphics', force=False):
+    """Redraws the out-of-date plots of results_dir/<name>/ and returns their names."""
+    folder = os.path.join(results_dir, name)
+    manifest_path = os.path.join(graphics_dir, name, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+
+    drawn = []
+    for plot, (draw, plot_inputs, output) in PLOTS.items():
+        inputs = plot_inputs(folder)
+        if not all(os.path.exists(path) for path in inputs):
+            continue
+        output_path = os.path.join(graphics_dir, name, output)
+        if not force and os.path.exists(output_path) and is_current(inputs, manifest.get(plot)):
+            continue
+        draw(name, results_dir, graphics_dir)
+        manifest[plot] = {}
+        for path in inputs:
+            stat = os.stat(path)
+            manifest[plot][path] = [stat.st_mtime_ns, stat.st_size, file_digest(path)]
+        drawn.append(plot)
+
+    os.makedirs(os.path.join(graphics_dir, name), exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+    return drawn
+
+def render_results(names=None, results_dir='results', graphics_dir='graphics', workers=1, force=False):
+    """Renders every result folder (or just names); returns {name: plots drawn}.
+
+    workers > 1 spreads the folders over that many processes; matplotlib is
+    imported once per worker, not once per plot.
+    """
+    if names is None:
+        names = sorted(name for name in os.listdir(results_dir) if os.path.isdir(os.path.join(results_dir, name)))
+    if workers <= 1 or len(names) <= 1:
+        return {name: render_result(name, results_dir, graphics_dir, force) for name in names}
+    with ProcessPoolExecutor(min(workers, len(names))) as executor:
+        futures = {name: executor.submit(render_result, name, results_dir, graphics_dir, force) for name in names}
+        return {name: future.result() for name, future in futures.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description='Draw the plots of the results/ folders that changed.')
+    parser.add_argument('names', nargs='*', help='result folders to draw (default: all)')
+    parser.add_argument('--results-dir', default='results')
+    parser.add_argument('--graphics-dir', default='graphics')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--force', action='store_true', help='redraw even if the inputs did not change')
+    args = parser.parse_args()
+
+    drawn = render_results(args.names or None, args.results_dir, args.graphics_dir, args.workers, args.force)
+    for name, plots in drawn.items():
+        print(f"{name}: {', '.join(plots) if plots else 'up to date'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+import struct
+import numpy as np
+
+# Per-generation statistics of a run, appended to a flat binary file as the
+# run goes instead of being kept in lists and dumped as JSON at the end.
+#
+# Layout: a 16 byte header (magic, version, record size, sampling interval)
+# followed by fixed-size little-endian records, so the file can be read
+# back with numpy.memmap without parsing.
+
+MAGIC = b'DRTL'
+VERSION = 1
+HEADER = struct.Struct('<4sIII')
+RECORD = struct.Struct('<iidddd')
+RECORD_DTYPE = np.dtype([
+    ('generation', '<i4'),
+    ('valid_count', '<i4'),   # individuals without penalties; stats below cover only those
+    ('best_fitness', '<f8'),  # -1 when no individual is valid, like generation_data.json
+    ('worst_fitness', '<f8'),
+    ('mean_fitness', '<f8'),
+    ('elapsed_time', '<f8'),
+])
+FILE_NAME = 'telemetry.bin'
+
+class TelemetrySink:
+    def __init__(self, path, every=1, append=False):
+        """Writes one record every `every` generations to path.
+
+        With append=True an existing file is continued instead of replaced,
+        which is how a resumed run keeps the history of the first one; it
+        then also keeps that file's sampling interval, whatever every is.
+        """
+        self.path = path
+        self.every = max(1, every)
+        if append and os.path.exists(path):
+            self.rows, self.every = read_header(path)
+            self.file = open(path, 'r+b')
+            self.truncate(self.rows)
+        else:
+            self.rows = 0
+            self.file = open(path, 'wb')
+            self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, self.every))
+
+    def append(self, generation, valid_count, best_fitness, worst_fitness, mean_fitness, elapsed_time):
+        if generation % self.every != 0:
+            return
+        self.file.write(RECORD.pack(generation, valid_count, best_fitness, worst_fitness, mean_fitness, elapsed_time))
+        self.rows += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def truncate(self, rows):
+        """Drops every record after the first `rows`, e.g. the ones written after a checkpoint."""
+        self.file.flush()
+        self.file.truncate(HEADER.size + rows * RECORD.size)
+        self.file.seek(0, os.SEEK_END)
+        self.rows = rows
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def read_header(path):
+    """(record count, sampling interval) of a telemetry file."""
+    with open(path, 'rb') as f:
+        magic, version, record_size, every = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f'{path} is not a version {VERSION} telemetry file')
+    return (os.path.getsize(path) - HEADER.size) // RECORD_DTYPE.itemsize, every
+
+def load_telemetry(path):
+    """Memory-maps a telemetry file as a structured array with RECORD_DTYPE fields."""
+    rows, _ = read_header(path)
+    if rows == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER.size, shape=(rows,))
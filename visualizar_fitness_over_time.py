@@ -1,6 +1,7 @@
 import json
 import os
 import matplotlib.pyplot as plt
+from telemetry import load_telemetry, FILE_NAME as TELEMETRY_FILE
 
 def load_json(file_path):
     if os.path.exists(file_path):
@@ -8,6 +9,15 @@ def load_json(file_path):
             return json.load(f)
     return []
 
+def load_fitness_over_time(file_name, results_dir='results'):
+    """(fitness, time) pairs of the AG, from telemetry.bin when the run wrote one."""
+    telemetry_path = f'{results_dir}/{file_name}/{TELEMETRY_FILE}'
+    if os.path.exists(telemetry_path):
+        data = load_telemetry(telemetry_path)
+        data = data[data["valid_count"] > 0]
+        return list(zip(data["best_fitness"].tolist(), data["elapsed_time"].tolist()))
+    return load_json(f'{results_dir}/{file_name}/fitness_over_time.json')
+
 def extract_data(data):
     return [item[0] for item in data], [item[1] for item in data]
 
@@ -31,44 +41,47 @@ def filtrar_pontos(tempo, fitness, distancia_minima=1):
             
     return zip(*pontos_filtrados)
 
-run_all = True
-
-if run_all:
-    files = os.listdir('results')
-else:
-    files = ['results/0/best_path_graph.json']
+def plot_fitness_over_time(file_name, results_dir='results', graphics_dir='graphics'):
+    file_path_simplex = f'{results_dir}/{file_name}/simplex.json'
 
-for file_name in files:
-    file_path_ag = f'results/{file_name}/fitness_over_time.json'
-    file_path_simplex = f'results/{file_name}/simplex.json'
-    
     # Load data
-    data_ag = load_json(file_path_ag)
+    data_ag = load_fitness_over_time(file_name, results_dir)
     data_simplex = load_json(file_path_simplex)
-    
+
     # Extract fitness and time
     fitness_ag, tempo_ag = extract_data(data_ag)
     fitness_simplex, tempo_simplex = extract_data(data_simplex)
-    
+
     # Filter points
     tempo_filtrado_ag, fitness_filtrado_ag = filtrar_pontos(tempo_ag, fitness_ag)
 
     # Create sub-plots
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
-    
+
     # Plot AG data in the first subplot
     plot_data(ax1, tempo_filtrado_ag, fitness_filtrado_ag, label='AG', color='b')
     ax1.set_title('AG: Fitness over Time')
-    
+
     # Plot Simplex data in the second subplot if available
     if data_simplex:
         tempo_filtrado_simplex, fitness_filtrado_simplex = filtrar_pontos(tempo_simplex, fitness_simplex)
         plot_data(ax2, tempo_filtrado_simplex, fitness_filtrado_simplex, label='Simplex', color='r')
         ax2.set_title('Simplex: Fitness over Time')
-    
-    plt.tight_layout()
+
+    fig.tight_layout()
 
     # Save the graph
-    os.makedirs(f'graphics/{file_name}', exist_ok=True)
-    plt.savefig(f'graphics/{file_name}/fitness_over_time.png')
-    # plt.show()  # Uncomment if you want to display the plot
+    os.makedirs(f'{graphics_dir}/{file_name}', exist_ok=True)
+    fig.savefig(f'{graphics_dir}/{file_name}/fitness_over_time.png')
+    plt.close(fig)
+
+if __name__ == "__main__":
+    run_all = True
+
+    if run_all:
+        files = os.listdir('results')
+    else:
+        files = ['0']
+
+    for file_name in files:
+        plot_fitness_over_time(file_name)
@@ -1,35 +1,38 @@
 import json
 import os
 import matplotlib.pyplot as plt
+from telemetry import load_telemetry, FILE_NAME as TELEMETRY_FILE
 
-run_all = True
+def load_generation_data(file_name, results_dir='results'):
+    """Reads telemetry.bin when the run wrote one, falling back to generation_data.json."""
+    telemetry_path = f'{results_dir}/{file_name}/{TELEMETRY_FILE}'
+    if os.path.exists(telemetry_path):
+        data = load_telemetry(telemetry_path)
+        # Remove entries with -1 values
+        data = data[data["best_fitness"] != -1]
+        return data["generation"], data["best_fitness"], data["worst_fitness"], data["mean_fitness"]
 
-if run_all:
-    files = os.listdir('results')
-else:
-    # Choose a specific file
-    files = ['results/0/generation_data.json']
-    
-
-for file_name in files:
-    file_path = f'results/{file_name}/generation_data.json'
+    file_path = f'{results_dir}/{file_name}/generation_data.json'
     with open(file_path, 'r') as f:
         data = json.load(f)
-    
-    # Remove entries with -1 values    
+
+    # Remove entries with -1 values
     data = [entry for entry in data if entry["best_fitness"] != -1]
-    
+
     best_fitness = [entry["best_fitness"] for entry in data]
     worst_fitness = [entry["worst_fitness"] for entry in data]
-    mean_fitness = [entry["mean_fitness"] for entry in data]    
+    mean_fitness = [entry["mean_fitness"] for entry in data]
     generations = [entry["generation"] for entry in data]
-    
-    plt.figure(figsize=(10, 6))
+    return generations, best_fitness, worst_fitness, mean_fitness
+
+def plot_fitness_over_generations(file_name, results_dir='results', graphics_dir='graphics'):
+    generations, best_fitness, worst_fitness, mean_fitness = load_generation_data(file_name, results_dir)
+
+    fig = plt.figure(figsize=(10, 6))
     plt.plot(generations, best_fitness, label="Best Fitness", marker='o')
     plt.plot(generations, worst_fitness, label="Worst Fitness", marker='o')
     plt.plot(generations, mean_fitness, label="Mean Fitness", marker='o')
-    
-    
+
     plt.title("Fitness Over Generations")
     plt.xlabel("Generation")
     plt.ylabel("Fitness Value")
@@ -37,10 +40,21 @@ for file_name in files:
     # Adding a legend
     plt.legend()
 
-    # Show the plot
     plt.grid(True)
     plt.tight_layout()
-    
-    os.makedirs(f'graphics/{file_name}', exist_ok=True)
-    plt.savefig(f'graphics/{file_name}/fitness_over_generations.png')
-      
\ No newline at end of file
+
+    os.makedirs(f'{graphics_dir}/{file_name}', exist_ok=True)
+    plt.savefig(f'{graphics_dir}/{file_name}/fitness_over_generations.png')
+    plt.close(fig)
+
+if __name__ == "__main__":
+    run_all = True
+
+    if run_all:
+        files = os.listdir('results')
+    else:
+        # Choose a specific file
+        files = ['0']
+
+    for file_name in files:
+        plot_fitness_over_generations(file_name)
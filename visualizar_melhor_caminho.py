@@ -1,95 +1,96 @@
 import json
 import os
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
 from adjustText import adjust_text
 import numpy as np
-import matplotlib.colors as mcolors
-
-run_all = True
-
-if run_all:
-    files = os.listdir('results')
-else:
-    # Choose a specific file
-    files = ['results/0/best_path_graph.json']
-    
-for file_name in files:
-    file_path = f'results/{file_name}/best_path_graph.json'
+
+# adjust_text gets very slow as the number of labels grows; above this many
+# points the labels stay where they are, and above the second limit they
+# are not drawn at all
+ADJUST_TEXT_MAX_POINTS = 60
+LABEL_MAX_POINTS = 300
+
+def plot_best_path(file_name, results_dir='results', graphics_dir='graphics'):
+    file_path = f'{results_dir}/{file_name}/best_path_graph.json'
     with open(file_path, 'r') as f:
         data = json.load(f)
-        
+
     best_path = data["best_path"]
     coordinates = data["coordinates"]
     best_fitness = data["best_fitness"]
-    
+
     best_fitness_rounded = round(best_fitness, 2)
 
     num_subroutes = best_path.count(0)
     best_path = [0] + best_path + [0]
-    
+
     # Extrair coordenadas na ordem do melhor caminho
-    ordered_coordinates = [coordinates[i] for i in best_path]
+    x_values = np.array([coordinates[i]["x"] for i in best_path], dtype=float)
+    y_values = np.array([coordinates[i]["y"] for i in best_path], dtype=float)
 
-    # Criar listas para os eixos X, Y e os pesos
-    x_values = [coord["x"] for coord in ordered_coordinates]
-    y_values = [coord["y"] for coord in ordered_coordinates]
-    pesos = [coord["peso"] for coord in ordered_coordinates]
-    
     fig, ax = plt.subplots(figsize=(10, 6))
-    
+
     first_coordinate = coordinates[0]
     ax.plot(first_coordinate['x'], first_coordinate['y'], marker='s', color='red', label='Base Inicial')
-    
+
     # Definir colormap
     colors = plt.cm.rainbow(np.linspace(0, 1, num_subroutes + 1))
-    
-    # Plotar segmentos com a cor correspondente de cada subrota
-    color_index = 0
-    current_color = colors[color_index]
-    
-    # Adicionar números e setas entre os pontos para indicar o caminho percorrido
-    for i in range(len(best_path) - 1):
-        x_start, y_start = x_values[i], y_values[i]
-        x_end, y_end = x_values[i + 1], y_values[i + 1]
-        
-        # Plotar segmento
-        ax.plot([x_start, x_end], [y_start, y_end], marker='o', color=current_color, lw=2,
-                label=f'Subrota {color_index+1}' if i == 0 or best_path[i] == 0 else "")
-        
-        # Cor de seta escura
-        darker_color = mcolors.to_rgba(current_color, alpha=1.0)
-        darker_color = (darker_color[0] * 0.7, darker_color[1] * 0.7, darker_color[2] * 0.7, darker_color[3])
-        arrow_x = (x_start + x_end) / 2
-        arrow_y = (y_start + y_end) / 2
-        dx = x_end - x_start
-        dy = y_end - y_start
-        ax.annotate('', xy=(arrow_x + dx * 0.001, arrow_y + dy * 0.001), xytext=(arrow_x, arrow_y),
-                    arrowprops=dict(arrowstyle="-|>", color=darker_color, lw=2),
-                    annotation_clip=False)
-
-        # Muda de cor ao voltar pra base
-        if best_path[i + 1] == 0:
-            color_index += 1
-            if color_index <= num_subroutes:
-                current_color = colors[color_index]
-    
-    texts = []
-    for i, (x, y, peso, idx) in enumerate(zip(x_values, y_values, pesos, best_path)):
-        text = ax.text(x + 0.1, y + 0.1, f'{idx} ({peso})', fontsize=10, ha='right')
-        texts.append(text)
-    
-    # Ajustar textos para evitar sobreposição
-    adjust_text(texts, arrowprops=dict(arrowstyle="->", color='red', lw=0.5))
-    
+
+    # Cor de cada segmento: muda ao voltar pra base
+    segment_colors = colors[np.cumsum([0] + [1 if city == 0 else 0 for city in best_path[1:-1]])]
+
+    # Todos os segmentos de uma vez, em vez de um plot por segmento
+    starts = np.column_stack((x_values[:-1], y_values[:-1]))
+    ends = np.column_stack((x_values[1:], y_values[1:]))
+    ax.add_collection(LineCollection(np.stack((starts, ends), axis=1), colors=segment_colors, linewidths=2))
+    ax.scatter(x_values[:-1], y_values[:-1], color=segment_colors, zorder=3)
+
+    # Setas no meio de cada segmento para indicar o caminho percorrido, numa única chamada
+    darker_colors = segment_colors * [0.7, 0.7, 0.7, 1.0]
+    middles = (starts + ends) / 2
+    directions = ends - starts
+    lengths = np.hypot(directions[:, 0], directions[:, 1])
+    directions = directions / np.where(lengths > 0, lengths, 1)[:, None]
+    ax.quiver(middles[:, 0], middles[:, 1], directions[:, 0], directions[:, 1], color=darker_colors,
+              angles='xy', pivot='middle', width=0.004, headwidth=4, headlength=5, scale=60, zorder=4)
+
+    # Uma entrada de legenda por subrota
+    handles = [Line2D([], [], color=colors[k], marker='o', lw=2, label=f'Subrota {k + 1}')
+               for k in range(num_subroutes + 1)]
+
+    # Um rótulo por ponto (a base aparece várias vezes no caminho)
+    labelled = list(dict.fromkeys(best_path))
+    if len(labelled) <= LABEL_MAX_POINTS:
+        texts = [ax.text(coordinates[i]["x"] + 0.1, coordinates[i]["y"] + 0.1, f'{i} ({coordinates[i]["peso"]})',
+                         fontsize=10, ha='right') for i in labelled]
+        # Ajustar textos para evitar sobreposição
+        if len(labelled) <= ADJUST_TEXT_MAX_POINTS:
+            adjust_text(texts, arrowprops=dict(arrowstyle="->", color='red', lw=0.5))
+
     # Configurações do gráfico
+    ax.autoscale_view()
     ax.set_title(f'Consumo de Bateria {best_fitness_rounded:.2f}')
     ax.grid(True)
-    ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.05), fancybox=True, shadow=True, ncol=5)    
-    
+    ax.legend(handles=[ax.get_lines()[0]] + handles, loc='upper center', bbox_to_anchor=(0.5, -0.05),
+              fancybox=True, shadow=True, ncol=5)
+
     # Ajustar o layout para evitar sobreposição
-    plt.tight_layout()
-    
-    # Mostrar o gráfico
-    # plt.show()
-    os.makedirs(f'graphics/{file_name}', exist_ok=True)
-    plt.savefig(f'graphics/{file_name}/best_path.png')
\ No newline at end of file
+    fig.tight_layout()
+
+    os.makedirs(f'{graphics_dir}/{file_name}', exist_ok=True)
+    fig.savefig(f'{graphics_dir}/{file_name}/best_path.png')
+    plt.close(fig)
+
+if __name__ == "__main__":
+    run_all = True
+
+    if run_all:
+        files = os.listdir('results')
+    else:
+        # Choose a specific file
+        files = ['0']
+
+    for file_name in files:
+        plot_best_path(file_name)